@@ -7,24 +7,47 @@ import asyncio
 import logging
 import os
 import pickle
-import random
 import time
-from typing import Tuple, Optional, Dict, Any
+from typing import List, Tuple, Optional
 
-from pyppeteer import launch
+from pyppeteer import connect, launch
 from pyppeteer.browser import Browser
 from pyppeteer.page import Page
 
 logger = logging.getLogger("telegram_parser.auth")
 
+# Directory for session files and browser profiles, next to parser_modules/
+_SESSION_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sessions")
+
 class TelegramAuth:
     """Handles authentication with Telegram Web."""
     
+    # Telegram Web selectors
+    _SEL_LOGGED_IN = '.chat-list, div[data-peer-id]'
+    _SEL_PRIMARY_BUTTON = 'button.btn-primary'
+    _SEL_PHONE_INPUT = 'div.input-field.input-field-phone > div.input-field-input'
+    _SEL_CODE_INPUT = 'input.input-field'
+    _SEL_CAPTCHA = 'img.captcha-image'
+    _SEL_PASSWORD = 'input[type="password"]'
+    _SEL_LOGIN_READY = f'{_SEL_PRIMARY_BUTTON}, {_SEL_LOGGED_IN}'
+    
+    # Small window and no GPU, extensions or background work to keep Chromium light
+    _BROWSER_ARGS = [
+        '--no-sandbox', '--disable-setuid-sandbox', '--disable-infobars',
+        '--window-size=1024,600', '--disable-dev-shm-usage', '--disable-gpu',
+        '--disable-background-networking', '--disable-background-timer-throttling',
+        '--disable-renderer-backgrounding', '--disable-features=TranslateUI,BlinkGenPropertyTrees',
+        '--mute-audio', '--no-first-run', '--no-default-browser-check', '--disable-extensions'
+    ]
+    _BLOCKED_RESOURCE_TYPES = frozenset({'image', 'media', 'font'})
+    
     def __init__(self, config):
         """Initialize the auth module with config."""
         self.config = config
-        self.session_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sessions")
+        self.session_dir = _SESSION_DIR
         os.makedirs(self.session_dir, exist_ok=True)
+        self._session_ok = False  # Result of the last logged-in check
+        self._last_session_save = None  # time.monotonic() of the last session write
         
     async def login(self, force_login: bool = False) -> Tuple[Browser, Page]:
         """
@@ -36,33 +59,86 @@ class TelegramAuth:
         Returns:
             Browser and Page instances
         """
-        browser_args = ['--no-sandbox', '--disable-setuid-sandbox', '--disable-infobars',
-                        '--window-size=1366,768', '--disable-dev-shm-usage']
-
-        if self.config.proxy:
-            browser_args.append(f'--proxy-server={self.config.proxy}')
-
-        browser = await launch(
-            headless=self.config.headless,
-            args=browser_args,
-            defaultViewport=None,
-            userDataDir=self._get_user_data_dir()
-        )
-
-        page = await browser.newPage()
-        await page.setUserAgent('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36')
+        browser = await self._launch_browser()
+        
+        # A kept-alive browser may still have a logged-in Telegram Web tab
+        if not force_login:
+            page = await self._find_logged_in_page(browser)
+            if page:
+                # Its setup belonged to the previous run's connection
+                await self._setup_page(page)
+                self._session_ok = True
+                logger.info("Reusing logged-in Telegram Web page from running browser")
+                return browser, page
+        
+        page = await self.new_page(browser)
 
-        # Переходим на Telegram Web
-        await page.goto('https://web.telegram.org/k/', {'waitUntil': 'networkidle0', 'timeout': 100000})
-        await asyncio.sleep(5)  # Ждём загрузку
+        # Переходим на Telegram Web; ждём список чатов или экран входа,
+        # чтобы устаревшая сессия не ждала таймаут
+        await self._open_telegram_web(page)
 
-        # Проверяем, залогинен ли пользователь
-        if not force_login and await self._is_logged_in(page):
+        # Проверяем, какой из них открылся
+        self._session_ok = not force_login and await self._is_logged_in(page)
+        if self._session_ok:
             logger.info("User is already logged in, skipping login process.")
             return browser, page
 
         # Если сессии нет или требуется повторный вход — выполняем авторизацию
-        return await self._perform_login(browser, page)
+        return await self._perform_login(browser, page, navigate=False)
+    
+    async def _launch_browser(self) -> Browser:
+        """Connect to a browser left running by a previous run, or launch a new one."""
+        browser = await self._connect_browser()
+        if browser:
+            return browser
+            
+        browser = await launch(
+            headless=self.config.headless,
+            args=self._get_browser_args(),
+            defaultViewport=None,
+            ignoreHTTPSErrors=True,
+            handleSIGINT=False,
+            handleSIGTERM=False,
+            handleSIGHUP=False,
+            userDataDir=self._get_user_data_dir(),
+            autoClose=not self.config.stay_alive
+        )
+        
+        if self.config.stay_alive:
+            try:
+                with open(self._get_ws_endpoint_file(), 'w', encoding='utf-8') as f:
+                    f.write(browser.wsEndpoint)
+            except Exception as e:
+                logger.error(f"Error saving browser endpoint: {str(e)}")
+                
+        return browser
+    
+    async def _connect_browser(self) -> Optional[Browser]:
+        """Connect to a running browser using the saved WebSocket endpoint."""
+        ws_file = self._get_ws_endpoint_file()
+        if not os.path.exists(ws_file):
+            return None
+            
+        try:
+            with open(ws_file, 'r', encoding='utf-8') as f:
+                ws_endpoint = f.read().strip()
+            browser = await connect(browserWSEndpoint=ws_endpoint, defaultViewport=None)
+            logger.info(f"Connected to running browser at {ws_endpoint}")
+            return browser
+        except Exception as e:
+            logger.info(f"Could not connect to running browser, launching a new one: {str(e)}")
+            try:
+                os.remove(ws_file)
+            except OSError:
+                pass
+            return None
+    
+    async def _find_logged_in_page(self, browser: Browser) -> Optional[Page]:
+        """Return an already open Telegram Web page that is logged in, if any."""
+        for page in await browser.pages():
+            if page.url.startswith('https://web.telegram.org') and await self._is_logged_in(page):
+                return page
+        return None
     
     async def login_as_guest(self) -> Tuple[Browser, Page]:
         """
@@ -71,44 +147,91 @@ class TelegramAuth:
         Returns:
             Browser and Page instances
         """
-        browser_args = ['--no-sandbox', '--disable-setuid-sandbox', '--disable-infobars',
-                        '--window-size=1366,768', '--disable-dev-shm-usage']
-
-        if self.config.proxy:
-            browser_args.append(f'--proxy-server={self.config.proxy}')
-
         browser = await launch(
             headless=self.config.headless,
-            args=browser_args,
-            defaultViewport=None
+            args=self._get_browser_args(),
+            defaultViewport=None,
+            ignoreHTTPSErrors=True,
+            handleSIGINT=False,
+            handleSIGTERM=False,
+            handleSIGHUP=False
         )
 
-        page = await browser.newPage()
-        await page.setUserAgent('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36')
+        page = await self.new_page(browser)
 
         # Go to Telegram Web
-        await page.goto('https://web.telegram.org/k/', {'waitUntil': 'networkidle0', 'timeout': 60000})
+        await self._open_telegram_web(page)
         logger.info("Started guest session (public channels only)")
         
         return browser, page
     
-    async def _perform_login(self, browser: Browser, page: Page) -> Tuple[Browser, Page]:
-        """Perform the login process."""
-        logger.info("Starting login process")
+    async def new_page(self, browser: Browser) -> Page:
+        """
+        Open a new page with the user agent and request blocking every parser page uses.
         
-        await page.goto('https://web.telegram.org/k/', {'waitUntil': 'networkidle0', 'timeout': 60000})
-        await asyncio.sleep(3)
+        Args:
+            browser: Browser to open the page in
+            
+        Returns:
+            Page instance
+        """
+        page = await browser.newPage()
+        await self._setup_page(page)
+        return page
+    
+    async def _setup_page(self, page: Page) -> None:
+        """Set the user agent and request blocking; every page the parser uses goes through here."""
+        await page.setUserAgent('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36')
+        await self._block_heavy_requests(page)
+    
+    async def _block_heavy_requests(self, page: Page) -> None:
+        """Abort image, media and font requests so Telegram Web loads faster."""
+        async def handle_request(request):
+            try:
+                if request.resourceType in self._BLOCKED_RESOURCE_TYPES:
+                    await request.abort()
+                else:
+                    await request.continue_()
+            except Exception as e:
+                logger.debug(f"Could not handle request {request.url}: {str(e)}")
+                
+        await page.setRequestInterception(True)
+        page.on('request', lambda request: asyncio.ensure_future(handle_request(request)))
+    
+    async def _open_telegram_web(self, page: Page) -> None:
+        """Navigate to Telegram Web and wait for the login screen or the chat list."""
+        await page.goto('https://web.telegram.org/k/', {'waitUntil': 'domcontentloaded', 'timeout': 30000})
+        try:
+            await page.waitForSelector(self._SEL_LOGIN_READY, {'timeout': 30000})
+        except Exception as e:
+            logger.warning(f"Telegram Web did not finish loading: {str(e)}")
+    
+    async def _perform_login(self, browser: Browser, page: Page, navigate: bool = True) -> Tuple[Browser, Page]:
+        """
+        Perform the login process.
         
-        # Check if we need to log in
-        if await self._is_logged_in(page):
-            logger.info("Already logged in")
-            return browser, page
+        Args:
+            browser: Browser instance
+            page: Page to log in with
+            navigate: Open Telegram Web first; False when the caller already
+                did and checked the login state
+        """
+        logger.info("Starting login process")
+        
+        if navigate:
+            await self._open_telegram_web(page)
+            
+            # Check if we need to log in
+            self._session_ok = await self._is_logged_in(page)
+            if self._session_ok:
+                logger.info("Already logged in")
+                return browser, page
         
         # Click on "Log in by phone Number"
         try:
             logger.info("Clicking on 'Log in by phone Number'")
-            await page.waitForSelector('button.btn-primary', {'timeout': 10000})
-            await page.click('button.btn-primary')
+            await page.waitForSelector(self._SEL_PRIMARY_BUTTON, {'timeout': 10000})
+            await page.click(self._SEL_PRIMARY_BUTTON)
         except Exception as e:
             logger.info(f"Phone number button not found, may already be at phone input: {str(e)}")
         
@@ -116,62 +239,53 @@ class TelegramAuth:
         try:
             # Wait for phone input field
             logger.info("Entering phone number")
-            country_code_selector = 'div.input-field.input-field-phone > div.input-field-input'
+            country_code_selector = self._SEL_PHONE_INPUT
             await page.waitForSelector(country_code_selector, {'visible': True, 'timeout': 10000})
             
-            # Clear the input field completely
-            # First click on the field
-            await page.click(country_code_selector)
-            await asyncio.sleep(0.5)
-            
-            # Use keyboard shortcuts to select all text and delete it
-            # First select all text (Ctrl+A or Command+A)
-            await page.keyboard.down('Control')  # Or 'Meta' for Mac
-            await page.keyboard.press('a')
-            await page.keyboard.up('Control')    # Or 'Meta' for Mac
-            await asyncio.sleep(0.5)
-            
-            # Then delete the selected text
-            await page.keyboard.press('Backspace')
-            await asyncio.sleep(0.5)
+            # Clear the input field completely in one step
+            await page.evaluate('''
+                (selector) => {
+                    const field = document.querySelector(selector);
+                    field.focus();
+                    if ('value' in field) field.value = '';
+                    field.textContent = '';
+                    field.dispatchEvent(new Event('input', {bubbles: true}));
+                }
+            ''', country_code_selector)
             
             # Now type the phone number
             phone_number = self.config.phone.strip()
             await page.type(country_code_selector, phone_number)
-            await asyncio.sleep(1)
 
-            # Нажимаем "Next"
-            next_button = await page.querySelector("button.btn-primary")
+            # Нажимаем "Next" как только кнопка станет активной
+            next_button = await page.waitForSelector(f'{self._SEL_PRIMARY_BUTTON}:not([disabled])', {'visible': True, 'timeout': 10000})
             await next_button.click()
             logger.info("Clicked Next after entering phone number")
             
             # Wait for code input or possible captcha
-            await asyncio.sleep(3)
+            state = await self._wait_for_any(page, [self._SEL_CAPTCHA, self._SEL_CODE_INPUT, self._SEL_PASSWORD], timeout=10000)
             
             # Check for captcha
-            captcha_img = await page.querySelector('img.captcha-image')
-            if captcha_img:
+            if state == self._SEL_CAPTCHA:
                 logger.warning("Captcha detected! Please solve it manually")
                 # Prompt user to solve captcha
                 print("\nCaptcha detected! Please solve it in the browser window.")
-                for _ in range(60):  # Wait up to 60 seconds
-                    captcha_img = await page.querySelector('img.captcha-image')
-                    if not captcha_img:
-                        logger.info("Captcha solved")
-                        break
-                    await asyncio.sleep(1)
-                else:
+                try:
+                    # Wait up to 60 seconds
+                    await page.waitForFunction('(selector) => !document.querySelector(selector)',
+                                               {'timeout': 60000}, self._SEL_CAPTCHA)
+                    logger.info("Captcha solved")
+                except Exception:
                     logger.error("Captcha solving timed out")
                     raise Exception("Captcha solving timed out")
                 
             # Wait for code input
-            code_input_selector = 'input.input-field'
+            code_input_selector = self._SEL_CODE_INPUT
             try:
                 await page.waitForSelector(code_input_selector, {'visible': True, 'timeout': 60000})
             except Exception as e:
                 # Check for 2FA password request
-                password_input = await page.querySelector('input[type="password"]')
-                if password_input:
+                if await self._has_element(page, self._SEL_PASSWORD):
                     return await self._handle_2fa(page, browser)
                 else:
                     logger.error(f"Failed to find code input: {str(e)}")
@@ -185,20 +299,17 @@ class TelegramAuth:
             # Enter verification code
             await page.type(code_input_selector, verification_code)
             logger.info("Entered verification code")
-            await asyncio.sleep(5)
             
-            # Check for 2FA
-            password_input = await page.querySelector('input[type="password"]')
-            if password_input:
+            # Wait for login to complete or for a 2FA request
+            state = await self._wait_for_any(page, [self._SEL_LOGGED_IN, self._SEL_PASSWORD])
+            if state == self._SEL_PASSWORD:
                 return await self._handle_2fa(page, browser)
-            
-            # Wait for login to complete
-            for _ in range(30):  # Wait up to 30 seconds
-                if await self._is_logged_in(page):
-                    logger.info("Successfully logged in")
-                    self._save_session()
-                    return browser, page
-                await asyncio.sleep(1)
+                
+            if state == self._SEL_LOGGED_IN:
+                logger.info("Successfully logged in")
+                self._session_ok = True
+                self._save_session()
+                return browser, page
                 
             logger.error("Login failed or timed out")
             raise Exception("Login failed or timed out")
@@ -214,56 +325,59 @@ class TelegramAuth:
         password = input().strip()
         
         # Enter 2FA password
-        await page.type('input[type="password"]', password)
+        await page.type(self._SEL_PASSWORD, password)
         
         # Click submit
-        submit_button = await page.querySelector('button.btn-primary')
+        submit_button = await page.querySelector(self._SEL_PRIMARY_BUTTON)
         if submit_button:
             await submit_button.click()
         
         # Wait for login to complete
-        for _ in range(30):  # Wait up to 30 seconds
-            if await self._is_logged_in(page):
-                logger.info("Successfully logged in with 2FA")
-                self._save_session()
-                return browser, page
-            await asyncio.sleep(1)
+        if await self._wait_for_any(page, [self._SEL_LOGGED_IN]):
+            logger.info("Successfully logged in with 2FA")
+            self._session_ok = True
+            self._save_session()
+            return browser, page
             
         logger.error("2FA login failed or timed out")
         raise Exception("2FA login failed or timed out")
     
-    async def _is_logged_in(self, page: Page) -> bool:
-        """Check if user is already logged in."""
-        try:
-            # Проверяем, отображается ли список чатов
-            chat_list = await page.querySelector('.chat-list, div[data-peer-id]')
-            return chat_list is not None
-        except Exception:
-            return False
-    
-    async def check_session_validity(self) -> bool:
+    async def _wait_for_any(self, page: Page, selectors: List[str], timeout: int = 30000) -> Optional[str]:
         """
-        Check if the current session is valid.
+        Wait until any of the selectors matches an element.
         
+        Args:
+            page: Page to watch
+            selectors: CSS selectors, checked in order
+            timeout: Maximum wait in milliseconds
+            
         Returns:
-            True if session is valid, False otherwise
+            The first matching selector, or None on timeout
         """
-        session_file = self._get_session_file()
-        if not os.path.exists(session_file):
-            return False
-            
         try:
-            with open(session_file, 'rb') as f:
-                session_data = pickle.load(f)
-                
-            # Check if session is expired (older than 7 days)
-            if time.time() - session_data.get('timestamp', 0) > 7 * 24 * 60 * 60:
-                logger.warning("Session is expired")
-                return False
-                
-            return True
+            handle = await page.waitForFunction(
+                '(selectors) => selectors.find(sel => document.querySelector(sel)) || false',
+                {'timeout': timeout},
+                selectors
+            )
+            try:
+                return await handle.jsonValue()
+            finally:
+                await handle.dispose()
         except Exception as e:
-            logger.error(f"Error checking session validity: {str(e)}")
+            logger.debug(f"None of {selectors} appeared: {str(e)}")
+            return None
+    
+    async def _has_element(self, page: Page, selector: str) -> bool:
+        """Check if an element matching selector exists, without creating an element handle."""
+        return await page.evaluate('(selector) => !!document.querySelector(selector)', selector)
+    
+    async def _is_logged_in(self, page: Page) -> bool:
+        """Check if user is already logged in."""
+        try:
+            # Проверяем, отображается ли список чатов
+            return await self._has_element(page, self._SEL_LOGGED_IN)
+        except Exception:
             return False
     
     async def logout(self) -> None:
@@ -334,23 +448,45 @@ class TelegramAuth:
         finally:
             await browser.close()
     
+    def _get_browser_args(self) -> List[str]:
+        """Get Chromium command line arguments."""
+        browser_args = list(self._BROWSER_ARGS)
+        if self.config.proxy:
+            browser_args.append(f'--proxy-server={self.config.proxy}')
+        return browser_args
+    
     def _get_user_data_dir(self) -> str:
         """Get path to user data directory for persistent browser session."""
         return os.path.join(self.session_dir, f"user_data_{self.config.phone}")
     
+    def _get_ws_endpoint_file(self) -> str:
+        """Get path to the file with the WebSocket endpoint of a kept-alive browser."""
+        return os.path.join(self.session_dir, f"ws_endpoint_{self.config.phone}.txt")
+    
     def _get_session_file(self) -> str:
         """Get path to session file."""
         return os.path.join(self.session_dir, f"session_{self.config.phone}.pickle")
     
     def _save_session(self) -> None:
-        """Save current session data."""
+        """Save current session data, writing to a temp file and renaming it into place."""
+        now = time.monotonic()
+        if self._last_session_save is not None and now - self._last_session_save < 1.0:
+            return  # Saved less than a second ago
+            
         try:
             session_data = {
                 'timestamp': time.time(),
                 'phone': self.config.phone
             }
-            with open(self._get_session_file(), 'wb') as f:
-                pickle.dump(session_data, f)
+            data = pickle.dumps(session_data, protocol=pickle.HIGHEST_PROTOCOL)
+            
+            session_file = self._get_session_file()
+            tmp_file = session_file + '.tmp'
+            with open(tmp_file, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_file, session_file)
+            
+            self._last_session_save = now
             logger.info("Session saved successfully")
         except Exception as e:
             logger.error(f"Error saving session: {str(e)}")
@@ -4,25 +4,454 @@ Handles parsing of Telegram channels
 """
 
 import asyncio
+import json
 import logging
 import re
 import time
-from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional
+import types
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Any, Optional
 
+import pyppeteer.connection
 from pyppeteer.browser import Browser
 from pyppeteer.page import Page
 
+try:
+    import orjson
+except ImportError:  # Optional, the standard json module is used without it
+    orjson = None
+
 logger = logging.getLogger("telegram_parser.channel_parser")
 
+def _loads(data):
+    """Decode a CDP message with orjson, falling back to json for what orjson rejects."""
+    try:
+        return orjson.loads(data)
+    except orjson.JSONDecodeError:
+        # e.g. lone surrogates in scraped post texts, which json accepts
+        return json.loads(data)
+
+def use_fast_cdp_json() -> None:
+    """
+    Let pyppeteer's connection decode CDP messages (e.g. batches of extracted posts)
+    with orjson, if it is installed.
+    """
+    if orjson is not None:
+        pyppeteer.connection.json = types.SimpleNamespace(loads=_loads, dumps=json.dumps)
+
+def _fill_datetimes(posts: List[Dict[str, Any]]) -> None:
+    """Fill the "datetime" placeholder of posts from their millisecond timestamps."""
+    fromtimestamp = datetime.fromtimestamp
+    for post in posts:
+        if "datetime" in post:
+            post["datetime"] = fromtimestamp(post["timestamp"] / 1000).isoformat()  # Convert ms to seconds
+
+# Shapes of the date texts shown in date group headers, each with the formats
+# that can parse it, so strptime is not tried against every format
+_DATE_TEXT_FORMATS = [
+    (re.compile(r'\d{1,2}\.\d{1,2}\.\d{4}'), ["%d.%m.%Y"]),        # 01.01.2023
+    (re.compile(r'\d{1,2}\.\d{1,2}\.\d{2}'), ["%d.%m.%y"]),        # 01.01.23
+    (re.compile(r'[A-Za-z]+\s+\d{1,2}'), ["%b %d", "%B %d"]),        # Jan 01, January 01
+    (re.compile(r'\d{1,2}\s+[A-Za-z]+'), ["%d %b", "%d %B"]),        # 01 Jan, 01 January
+]
+
+@lru_cache(maxsize=1024)
+def _parse_date_text(date_text: str, today: date) -> Optional[date]:
+    """
+    Parse the date text of a message, as shown in the date group header.
+    
+    Args:
+        date_text: Date text, e.g. "Today", "01.01.2023" or "Jan 01"
+        today: Current date, for relative dates and dates without a year
+        
+    Returns:
+        The date, or None if the text has no known format
+    """
+    lowered = date_text.lower()
+    if "today" in lowered:
+        return today
+    if "yesterday" in lowered:
+        return today - timedelta(days=1)
+        
+    for pattern, formats in _DATE_TEXT_FORMATS:
+        if not pattern.fullmatch(date_text):
+            continue
+        for fmt in formats:
+            try:
+                parsed_date = datetime.strptime(date_text, fmt).date()
+            except ValueError:
+                continue
+            if "%y" not in fmt and "%Y" not in fmt:
+                # Set the year to current year
+                parsed_date = parsed_date.replace(year=today.year)
+                # If the date is in the future, it's probably from last year
+                if parsed_date > today:
+                    parsed_date = parsed_date.replace(year=today.year - 1)
+            return parsed_date
+    return None
+
+def _channel_key(identifier: str) -> str:
+    """
+    Normalize a channel identifier or URL for comparing which channel a page shows.
+    
+    Args:
+        identifier: Channel username or ID, Telegram Web URL (#@username or #peer) or t.me URL
+        
+    Returns:
+        Lowercase username or ID without "@"
+    """
+    if "#" in identifier:
+        identifier = identifier.rsplit("#", 1)[1]
+    elif identifier.startswith("https://"):
+        identifier = identifier.rstrip("/").rsplit("/", 1)[1]
+    return identifier.removeprefix("@").lower()
+
+# Message elements in the chat history
+_MESSAGE_SELECTOR = '.message, .bubble, .message-list-item'
+
+# The chat scroll container, looked up again only when the app re-rendered it
+_SCROLL_CONTAINER_EXPR = (
+    "((window.__tpScroll && window.__tpScroll.isConnected) ? window.__tpScroll"
+    " : (window.__tpScroll = document.querySelector('#MiddleColumn')))"
+)
+
+# Resolves true once more than prevCount messages are rendered, false after timeoutMs
+_WAIT_FOR_MESSAGES_JS = '''
+    (selector, prevCount, timeoutMs) => new Promise((resolve) => {
+        if (document.querySelectorAll(selector).length > prevCount) {
+            resolve(true);
+            return;
+        }
+        const container = ''' + _SCROLL_CONTAINER_EXPR + ''' || document.body;
+        const observer = new MutationObserver(() => {
+            if (document.querySelectorAll(selector).length > prevCount) {
+                observer.disconnect();
+                clearTimeout(timer);
+                resolve(true);
+            }
+        });
+        const timer = setTimeout(() => {
+            observer.disconnect();
+            resolve(false);
+        }, timeoutMs);
+        observer.observe(container, {childList: true, subtree: true});
+    })
+'''
+
+# Channel title, or null when no channel is open
+_CHANNEL_TITLE_JS = '''
+    () => {
+        const title = document.querySelector('.chat-info .peer-title');
+        return title ? title.textContent : null;
+    }
+'''
+
+# The channel title once it is shown and differs from previousTitle, false until then
+_TITLE_CHANGED_JS = '''
+    (previousTitle) => {
+        const title = document.querySelector('.chat-info .peer-title');
+        return !!title && title.textContent !== previousTitle && title.textContent;
+    }
+'''
+
+# Channel header fields in one browser round-trip
+_CHANNEL_INFO_JS = '''
+    () => {
+        const text = (selector) => {
+            const el = document.querySelector(selector);
+            return el ? el.textContent : null;
+        };
+        const subscribers = text('.chat-info-container .profile-subtitle');
+        const count = subscribers && subscribers.match(/(\\d+(?:\\.\\d+)?[KMG]?)/);
+        return {
+            title: text('.chat-info .peer-title'),
+            description: text('.chat-info .info .subtitle'),
+            subscribers: count ? count[1] : null
+        };
+    }
+'''
+
+# Collects every field of a message element in one browser round-trip
+_EXTRACT_POST_JS = '''
+    (element) => {
+        const text = (el) => el ? el.textContent : null;
+        
+        // Counts such as "1234", "1.2K" or "3M", matched here so only the count is returned
+        const count = (el) => {
+            const match = el && el.textContent.match(/(\\d+(?:\\.\\d+)?[KMG]?)/);
+            return match ? match[1] : null;
+        };
+        
+        // Millisecond timestamp attribute of an element, if it has one
+        const timestampOf = (el) => {
+            const value = el ? el.getAttribute('data-timestamp') : null;
+            return value === null ? null : parseInt(value, 10);
+        };
+        
+        // Date and timestamp
+        const dateElement = element.querySelector('.time, .date');
+        
+        // Content
+        let content = null;
+        const contentElement = element.querySelector('.message-content, .text-content, .bubble-content');
+        if (contentElement) {
+            const textElements = contentElement.querySelectorAll('.text-content, .message-text');
+            content = textElements.length > 0
+                ? Array.from(textElements).map(el => el.textContent).join('\\n')
+                : contentElement.textContent;
+        }
+        
+        // Reactions
+        let reactions = null;
+        const reactionsElement = element.querySelector('.reactions, .reaction-counter, .like-button');
+        if (reactionsElement) {
+            const counters = reactionsElement.querySelectorAll('.counter, .reaction-count');
+            if (counters.length > 0) {
+                reactions = 0;
+                for (const counter of counters) {
+                    reactions += parseInt(counter.textContent, 10) || 0;
+                }
+            } else {
+                const match = reactionsElement.textContent.match(/\\d+/);
+                reactions = match ? parseInt(match[0], 10) : 0;
+            }
+        }
+        
+        // Media
+        const media = [];
+        element.querySelectorAll('.media-photo, img.photo, .attachment-photo').forEach(photo => {
+            const src = photo.src || photo.dataset.src;
+            if (src) media.push({type: 'photo', url: src});
+        });
+        element.querySelectorAll('.media-video, video, .attachment-video').forEach(video => {
+            const src = video.src || video.dataset.src;
+            if (src) media.push({type: 'video', url: src});
+        });
+        element.querySelectorAll('.document, .attachment-document').forEach(doc => {
+            const nameElem = doc.querySelector('.document-name, .filename');
+            media.push({type: 'document', name: nameElem ? nameElem.textContent : 'Document'});
+        });
+        
+        // Date used for the date-range check
+        const dateGroupElement = element.querySelector('.message-date-group, .time');
+        
+        return {
+            id: element.getAttribute('data-mid') ||
+                element.getAttribute('data-message-id') ||
+                element.id ||
+                null,
+            date: text(dateElement),
+            timestamp: timestampOf(dateElement),
+            content: content,
+            views: count(element.querySelector('.views, .message-views')),
+            reactions: reactions,
+            comments: count(element.querySelector('.replies, .comments-button, .comments-count')),
+            media: media,
+            forwarded_from: text(element.querySelector('.forwarded-from, .forward-name')),
+            date_group: text(dateGroupElement),
+            message_timestamp: timestampOf(element.querySelector('[data-timestamp]'))
+        };
+    }
+'''
+
+# Extracts messages not returned before for this channel (see _RESET_SEEN_IDS_JS).
+# A limit of 0 means no limit. Messages with a timestamp outside [startMs, endMs)
+# are dropped here; reachedStart tells that one older than startMs was seen.
+_EXTRACT_NEW_POSTS_JS = '''
+    (selector, limit, startMs, endMs) => {
+        const extractPost = window.__tp.extractPost;
+        const seen = window.__tpSeenIds || (window.__tpSeenIds = new Set());
+        const elements = document.querySelectorAll(selector);
+        const posts = [];
+        let reachedStart = false;
+        for (const element of elements) {
+            if (limit && posts.length >= limit) break;
+            const id = element.getAttribute('data-mid') ||
+                       element.getAttribute('data-message-id') ||
+                       element.id ||
+                       null;
+            if (!id || seen.has(id)) continue;
+            seen.add(id);
+            const post = extractPost(element);
+            const timestamp = post.message_timestamp;
+            if (timestamp) {
+                if (startMs !== null && timestamp < startMs) {
+                    if (post.date !== null) reachedStart = true;
+                    continue;
+                }
+                if (endMs !== null && timestamp >= endMs) continue;
+            }
+            posts.push(post);
+        }
+        return {count: elements.length, posts: posts, reachedStart: reachedStart};
+    }
+'''
+
+# Scrolls the chat to the newest messages
+_SCROLL_TO_BOTTOM_JS = '''
+    () => {
+        const middleColumn = ''' + _SCROLL_CONTAINER_EXPR + ''';
+        if (middleColumn) {
+            // Scroll to the very bottom to ensure we start with newest messages
+            middleColumn.scrollTop = middleColumn.scrollHeight;
+            console.log('Initialized to newest messages at:', middleColumn.scrollTop);
+        }
+    }
+'''
+
+# Scrolls the chat up by 800px, false if it did not move (e.g. at the top).
+# After moving, resolves on the first change to the chat or after waitMs.
+_SCROLL_UP_JS = '''
+    (waitMs) => {
+        const middleColumn = ''' + _SCROLL_CONTAINER_EXPR + ''';
+        if (middleColumn) {
+            // Check if we're already at the top
+            if (middleColumn.scrollTop <= 10) {
+                return false;
+            }
+
+            // Store previous position
+            const oldScrollTop = middleColumn.scrollTop;
+
+            // Scroll up by 800px to load older messages
+            middleColumn.scrollTop -= 800;
+
+            if (oldScrollTop === middleColumn.scrollTop) {
+                return false;
+            }
+
+            // Give the app a moment to render what the scroll revealed
+            return new Promise((resolve) => {
+                const observer = new MutationObserver(() => {
+                    observer.disconnect();
+                    clearTimeout(timer);
+                    resolve(true);
+                });
+                const timer = setTimeout(() => {
+                    observer.disconnect();
+                    resolve(true);
+                }, waitMs);
+                observer.observe(middleColumn, {childList: true, subtree: true});
+            });
+        }
+        return false;
+    }
+'''
+
+# Runs up to steps scrollUp steps in the page and reports the resulting position
+_SCROLL_BATCH_JS = '''
+    async (steps, waitMs) => {
+        let scrolls = 0;
+        while (scrolls < steps && await window.__tp.scrollUp(waitMs)) {
+            scrolls++;
+        }
+        const middleColumn = ''' + _SCROLL_CONTAINER_EXPR + ''';
+        return {
+            scrolls: scrolls,
+            scrollTop: middleColumn ? middleColumn.scrollTop : null,
+            scrollHeight: middleColumn ? middleColumn.scrollHeight : null
+        };
+    }
+'''
+
+# Installs the helpers above as window.__tp, so later calls only send a short
+# call expression instead of the whole function source.
+_INSTALL_HELPERS_JS = '''
+    () => {
+        window.__tp = {
+            extractPost: ''' + _EXTRACT_POST_JS + ''',
+            extractNewPosts: ''' + _EXTRACT_NEW_POSTS_JS + ''',
+            waitForMessages: ''' + _WAIT_FOR_MESSAGES_JS + ''',
+            scrollUp: ''' + _SCROLL_UP_JS + ''',
+            scrollBatch: ''' + _SCROLL_BATCH_JS + '''
+        };
+    }
+'''
+
+# Starts a new channel; returns false when the helpers are missing from the document
+_RESET_SEEN_IDS_JS = '''
+    () => {
+        window.__tpSeenIds = new Set();
+        return !!window.__tp;
+    }
+'''
+_CALL_EXTRACT_NEW_POSTS_JS = '(selector, limit, startMs, endMs) => window.__tp.extractNewPosts(selector, limit, startMs, endMs)'
+_CALL_WAIT_FOR_MESSAGES_JS = '(selector, prevCount, timeoutMs) => window.__tp.waitForMessages(selector, prevCount, timeoutMs)'
+_CALL_SCROLL_BATCH_JS = '(steps, waitMs) => window.__tp.scrollBatch(steps, waitMs)'
+
 class ChannelParser:
     """Parser for Telegram channels."""
     
+    # Stop scrolling after this long without new posts or scroll movement
+    _MAX_IDLE_SECONDS = 15.0
+    
+    # Longest pause after a scroll step when the chat does not change
+    _SCROLL_STEP_WAIT_MS = 300
+    
     def __init__(self, browser: Browser, page: Page, config):
         """Initialize with browser, page and config."""
         self.browser = browser
         self.page = page
         self.config = config
+        self._cached_title = None  # Title of the channel currently open
+        self._strings = {}  # Shared copies of strings repeated across posts
+        
+        # Date range as local-midnight millisecond bounds [start, end)
+        self._start_ms = self._end_ms = None
+        if config.start_date:
+            self._start_ms = int(datetime.combine(config.start_date, datetime.min.time()).timestamp() * 1000)
+        if config.end_date:
+            self._end_ms = int(datetime.combine(config.end_date + timedelta(days=1), datetime.min.time()).timestamp() * 1000)
+        
+    @classmethod
+    async def parse_channels(cls, browser: Browser, pages: List[Page], config,
+                             channel_identifiers: List[str],
+                             on_parsed: Optional[Callable[[str, Dict[str, Any]], Awaitable[Any]]] = None) -> Dict[str, Any]:
+        """
+        Parse several channels at the same time, one channel per page.
+        
+        The pages should belong to the logged in browser context: incognito
+        contexts do not share the Telegram Web session.
+        
+        Args:
+            browser: Browser instance
+            pages: Pages to parse on, their number is the concurrency
+            config: Configuration
+            channel_identifiers: Channel usernames, IDs, or URLs
+            on_parsed: Coroutine function called with the identifier and channel data once
+                the channel's page is back in the pool, so the next channel is parsed
+                meanwhile. Its result is returned instead of the channel data, so a caller
+                exporting each channel does not keep them all in memory
+            
+        Returns:
+            Dict mapping each identifier to its channel data (or on_parsed's result),
+            or to the exception raised
+        """
+        page_pool = asyncio.Queue()
+        for page in pages:
+            page_pool.put_nowait(page)
+            
+        async def parse_one(channel_identifier):
+            try:
+                page = await page_pool.get()
+                try:
+                    channel_data = await cls(browser, page, config).parse_channel(channel_identifier)
+                finally:
+                    page_pool.put_nowait(page)
+                    
+                if on_parsed is not None:
+                    return await on_parsed(channel_identifier, channel_data)
+                return channel_data
+            except Exception as e:
+                logger.error(f"Error parsing channel {channel_identifier}: {str(e)}", exc_info=True)
+                raise
+                
+        results = await asyncio.gather(
+            *[parse_one(identifier) for identifier in channel_identifiers],
+            return_exceptions=True
+        )
+        return dict(zip(channel_identifiers, results))
         
     async def parse_channel(self, channel_identifier: str) -> Dict[str, Any]:
         """
@@ -39,11 +468,9 @@ class ChannelParser:
         # Navigate to channel
         await self._navigate_to_channel(channel_identifier)
         
-        # Get channel info
-        channel_info = await self._get_channel_info()
-        
-        # Get posts
-        posts = await self._get_posts()
+        # Get channel info and posts; the header is read while the first batch loads
+        channel_info, posts = await asyncio.gather(self._get_channel_info(), self._get_posts())
+        _fill_datetimes(posts)
         
         return {
             "channel": channel_info,
@@ -53,11 +480,8 @@ class ChannelParser:
         
     async def _navigate_to_channel(self, channel_identifier: str) -> None:
         """Navigate to the channel page."""
-        # Clean up the identifier
-        if channel_identifier.startswith("@"):
-            channel_identifier = channel_identifier[1:]
-            
-        # Construct URL
+        # Clean up the identifier and construct URL
+        channel_identifier = channel_identifier.removeprefix("@")
         if channel_identifier.startswith("https://"):
             url = channel_identifier
         else:
@@ -66,11 +490,33 @@ class ChannelParser:
         logger.info(f"Navigating to: {url}")
         
         try:
-            await self.page.goto(url, {'waitUntil': 'networkidle0', 'timeout': 60000})
-            await asyncio.sleep(5)  # Wait for possible redirects and content load
+            # A reused page may still show the previous channel. When that is the
+            # channel asked for, its title is already the right one; otherwise
+            # wait for the title to change from the previous channel's
+            target_key = _channel_key(url)
+            if _channel_key(self.page.url) == target_key:
+                previous_title = None
+            else:
+                previous_title = await self._get_channel_title()
+            self._cached_title = None
+            
+            await self.page.goto(url, {'waitUntil': 'domcontentloaded', 'timeout': 30000})
+            
+            # Wait for the channel header to show a new title. The title is a
+            # primitive, so reading it from the handle needs no extra round trip.
+            try:
+                title_handle = await self.page.waitForFunction(_TITLE_CHANGED_JS, {'timeout': 15000}, previous_title)
+                channel_title = self._cached_title = await title_handle.jsonValue()
+                await title_handle.dispose()
+            except Exception as e:
+                logger.debug(f"Channel title did not change after navigation: {str(e)}")
+                # Only trust the title on screen if the page is at the channel asked for
+                if _channel_key(self.page.url) == target_key:
+                    channel_title = await self._get_channel_title()
+                else:
+                    channel_title = None
             
             # Check if we're on the channel page
-            channel_title = await self._get_channel_title()
             if not channel_title:
                 logger.warning(f"Could not find channel: {channel_identifier}")
                 raise Exception(f"Channel not found: {channel_identifier}")
@@ -85,30 +531,16 @@ class ChannelParser:
         channel_info = {}
         
         try:
-            # Get channel title
-            channel_title = await self._get_channel_title()
-            channel_info["title"] = channel_title
+            raw = await self._evaluate_value(_CHANNEL_INFO_JS)
             
-            # Get channel description
-            try:
-                # Updated selector for channel description
-                description_element = await self.page.querySelector('.chat-info .info .subtitle')
-                if description_element:
-                    channel_info["description"] = await self.page.evaluate('(element) => element.textContent', description_element)
-            except Exception as e:
-                logger.debug(f"Could not get channel description: {str(e)}")
+            # Reuse the title read while navigating
+            channel_info["title"] = self._cached_title if self._cached_title is not None else raw["title"]
+            
+            if raw["description"] is not None:
+                channel_info["description"] = raw["description"]
                 
-            # Get subscriber count
-            try:
-                # Updated selector for subscribers count
-                subscribers_element = await self.page.querySelector('.chat-info-container .profile-subtitle')
-                if subscribers_element:
-                    subscribers_text = await self.page.evaluate('(element) => element.textContent', subscribers_element)
-                    subscribers_match = re.search(r'(\d+(?:\.\d+)?[KMG]?)', subscribers_text)
-                    if subscribers_match:
-                        channel_info["subscribers"] = subscribers_match.group(1)
-            except Exception as e:
-                logger.debug(f"Could not get subscriber count: {str(e)}")
+            if raw["subscribers"]:
+                channel_info["subscribers"] = raw["subscribers"]
                 
             # Get channel username/link
             current_url = self.page.url
@@ -124,96 +556,39 @@ class ChannelParser:
             return {"title": "Unknown", "error": str(e)}
             
     async def _get_channel_title(self) -> Optional[str]:
-        """Get the channel title."""
+        """Get the channel title and remember it for _get_channel_info."""
         try:
-            # Updated selector for channel title
-            title_element = await self.page.querySelector('.chat-info .peer-title')
-            if title_element:
-                return await self.page.evaluate('(element) => element.textContent', title_element)
-            return None
+            self._cached_title = await self.page.evaluate(_CHANNEL_TITLE_JS)
+            return self._cached_title
         except Exception:
             return None
 
-    async def _is_date_in_range(self, element) -> bool:
-        """Check if message date is within the specified date range."""
+    def _is_date_in_range(self, raw: Dict[str, Any]) -> bool:
+        """
+        Check if the date text of a message is within the specified date range.
+        
+        Only used for messages without a timestamp; those with one are already
+        filtered in the page by _EXTRACT_NEW_POSTS_JS.
+        """
         if not (self.config.start_date or self.config.end_date):
             return True  # No date filtering
             
         try:
-            # Get date element
-            date_element = await element.querySelector('.message-date-group')
-            if not date_element:
-                date_element = await element.querySelector('.time')
-                
-            if not date_element:
+            date_text = raw["date_group"]
+            if date_text is None:
                 return True  # Can't determine date, include by default
                 
-            date_text = await self.page.evaluate('(element) => element.textContent', date_element)
-            
-            # Try to parse the date
-            # First check if it has a timestamp attribute
-            timestamp = await self.page.evaluate('''
-                (element) => {
-                    const timeElem = element.querySelector('[data-timestamp]');
-                    if (timeElem) {
-                        return parseInt(timeElem.getAttribute('data-timestamp'), 10);
-                    }
-                    return null;
-                }
-            ''', element)
-            
-            if timestamp:
-                msg_date = datetime.fromtimestamp(timestamp / 1000)  # Convert from ms to seconds
-            else:
-                # Try to parse from text
-                # Handle different date formats (today, yesterday, date)
-                current_date = datetime.now()
-                
-                if "today" in date_text.lower():
-                    msg_date = current_date
-                elif "yesterday" in date_text.lower():
-                    msg_date = current_date - timedelta(days=1)
-                else:
-                    # Try to parse the date
-                    try:
-                        # Attempt multiple date formats
-                        date_formats = [
-                            "%d.%m.%Y",  # 01.01.2023
-                            "%d.%m.%y",   # 01.01.23
-                            "%b %d",      # Jan 01
-                            "%d %b",      # 01 Jan
-                            "%B %d",      # January 01
-                            "%d %B"       # 01 January
-                        ]
-                        
-                        for fmt in date_formats:
-                            try:
-                                # Add year if not in format
-                                if "%y" not in fmt and "%Y" not in fmt:
-                                    parsed_date = datetime.strptime(date_text, fmt)
-                                    # Set the year to current year
-                                    msg_date = parsed_date.replace(year=current_date.year)
-                                    # If the date is in the future, it's probably from last year
-                                    if msg_date > current_date:
-                                        msg_date = msg_date.replace(year=current_date.year - 1)
-                                    break
-                                else:
-                                    msg_date = datetime.strptime(date_text, fmt)
-                                    break
-                            except ValueError:
-                                continue
-                        else:
-                            # If no format matched, default to include the message
-                            return True
-                    except Exception:
-                        # If parsing fails, include the message
-                        return True
+            # Parse from text (today, yesterday, date)
+            msg_date = _parse_date_text(date_text, date.today())
+            if msg_date is None:
+                # If no format matched, default to include the message
+                return True
             
             # Check against date range
-            if self.config.start_date and msg_date.date() < self.config.start_date:
+            if self.config.start_date and msg_date < self.config.start_date:
                 return False
                 
-            if self.config.end_date and msg_date.date() > self.config.end_date:
+            if self.config.end_date and msg_date > self.config.end_date:
                 return False
                 
             return True
@@ -224,364 +599,238 @@ class ChannelParser:
             
     async def _get_posts(self) -> List[Dict[str, Any]]:
         """Get posts from the channel in chronological order from newest to oldest."""
-        posts = []
+        return [post async for post in self._iter_posts()]
+        
+    async def _iter_posts(self) -> AsyncIterator[Dict[str, Any]]:
+        """Yield posts from the channel as they are extracted, from newest to oldest."""
+        post_count = 0
         post_limit = self.config.limit
         
         logger.info(f"Getting up to {post_limit} posts from newest to oldest")
         
         try:
-            # Track processed messages to avoid duplicates
-            processed_ids = set()
-            consecutive_no_new_posts = 0
-            max_no_new_attempts = 5
             scroll_batch_size = 10  # Number of scrolls before processing messages
             scroll_count = 0
-            batch_start_time = time.time()
+            stop_scrolling = False
+            batch_start_time = last_progress_time = time.monotonic()
+            debug = logger.isEnabledFor(logging.DEBUG)  # Skip formatting debug messages in the loop
+            log_batches = logger.isEnabledFor(logging.INFO)
             
-            # Initialize scrolling position to start at the bottom (newest messages)
-            await self.page.evaluate('''
-                () => {
-                    const middleColumn = document.querySelector('#MiddleColumn');
-                    if (middleColumn) {
-                        // Scroll to the very bottom to ensure we start with newest messages
-                        middleColumn.scrollTop = middleColumn.scrollHeight;
-                        console.log('Initialized to newest messages at:', middleColumn.scrollTop);
-                    }
-                }
-            ''')
+            # Messages outside the date range do not count towards the limit,
+            # so the page may only stop early when there is no date range
+            limit_in_page = not (self.config.start_date or self.config.end_date)
+            
+            # Install the helpers and initialize scrolling position to start at
+            # the bottom (newest messages); the two are independent
+            await asyncio.gather(
+                self._prepare_helpers(),
+                self.page.evaluate(_SCROLL_TO_BOTTOM_JS)
+            )
             
             # Wait for initial messages to load properly
-            await asyncio.sleep(3)  
+            await self._wait_for_new_messages(0, timeout_ms=3000)
             
-            while len(posts) < post_limit and consecutive_no_new_posts < max_no_new_attempts:
-                # Get all visible message elements (starting with newest)
-                message_elements = await self.page.querySelectorAll('.message, .bubble, .message-list-item')
+            while post_count < post_limit and not stop_scrolling:
+                # Extract messages not processed yet (starting with newest) while the next
+                # scroll batch is already being sent. The page runs the extraction first,
+                # so it still sees the messages rendered before scrolling.
+                batch, scrolls = await asyncio.gather(
+                    self._evaluate_value(
+                        _CALL_EXTRACT_NEW_POSTS_JS,
+                        _MESSAGE_SELECTOR,
+                        post_limit - post_count if limit_in_page else 0,
+                        self._start_ms,
+                        self._end_ms
+                    ),
+                    self._scroll_up(scroll_batch_size)
+                )
+                message_count = batch["count"]
+                scroll_count += scrolls
+                new_posts_in_batch = 0
                 
-                if not message_elements:
-                    logger.debug("No message elements found with current selectors")
-                    consecutive_no_new_posts += 1
-                    continue
+                if batch["reachedStart"]:
+                    logger.info(f"Found messages older than start date, stopping scroll")
+                    stop_scrolling = True
                 
-                logger.debug(f"Found {len(message_elements)} message elements visible")
-                new_posts_in_batch = 0
+                if debug:
+                    if not message_count:
+                        logger.debug("No message elements found with current selectors")
+                    else:
+                        logger.debug(f"Found {message_count} message elements visible, {len(batch['posts'])} new")
                 
-                # Process visible messages (newest first)
-                for msg_element in message_elements:
-                    if len(posts) >= post_limit:
+                # Process new messages (newest first)
+                for raw in batch["posts"]:
+                    if post_count >= post_limit:
                         break
                         
                     try:
-                        # Get message ID to avoid duplicates
-                        msg_id = await self.page.evaluate('''
-                            (element) => {
-                                return element.getAttribute('data-mid') || 
-                                    element.getAttribute('data-message-id') ||
-                                    element.id || 
-                                    null;
-                            }
-                        ''', msg_element)
-                        
-                        if not msg_id or msg_id in processed_ids:
-                            continue
-                        
-                        processed_ids.add(msg_id)
-                        
-                        # Check date range
-                        in_range = await self._is_date_in_range(msg_element)
-                        
-                        # If we're checking dates and this message is too old
-                        if not in_range and self.config.start_date:
-                            date_element = await msg_element.querySelector('.time, .date')
-                            if date_element:
-                                date_text = await self.page.evaluate('(element) => element.textContent', date_element)
-                                logger.debug(f"Message with date {date_text} outside date range")
-                                
-                                # Get timestamp if available
-                                timestamp = await self.page.evaluate('''
-                                    (element) => {
-                                        const timeElem = element.querySelector('[data-timestamp]');
-                                        if (timeElem) {
-                                            return parseInt(timeElem.getAttribute('data-timestamp'), 10);
-                                        }
-                                        return null;
-                                    }
-                                ''', msg_element)
-                                
-                                if timestamp:
-                                    msg_date = datetime.fromtimestamp(timestamp / 1000)
-                                    if msg_date.date() < self.config.start_date:
-                                        logger.info(f"Found messages older than start date, stopping scroll")
-                                        consecutive_no_new_posts = max_no_new_attempts  # Force stop
+                        # Messages with a timestamp were already checked in the page,
+                        # this handles the ones with only a date text
+                        if raw["message_timestamp"] is None and not self._is_date_in_range(raw):
+                            if debug:
+                                logger.debug(f"Message with date {raw['date']} outside date range")
                             continue
                         
-                        # Extract post data
-                        post_data = await self._extract_post_data(msg_element)
+                        # Build post data
+                        post_data = self._build_post_data(raw)
                         
                         if post_data and "id" in post_data:
-                            posts.append(post_data)
+                            post_count += 1
                             new_posts_in_batch += 1
-                            logger.debug(f"Extracted post {len(posts)}/{post_limit}: {post_data.get('id', 'unknown')}")
+                            if debug:
+                                logger.debug(f"Extracted post {post_count}/{post_limit}: {post_data.get('id', 'unknown')}")
+                            yield post_data
                     except Exception as e:
                         logger.error(f"Error processing message: {str(e)}")
                 
                 # If we have enough posts or found too old messages, stop scrolling
-                if len(posts) >= post_limit or consecutive_no_new_posts >= max_no_new_attempts:
+                if post_count >= post_limit or stop_scrolling:
                     break
                     
-                # Check if we're at the top of the chat
-                at_top = await self.page.evaluate('''
-                    () => {
-                        const middleColumn = document.querySelector('#MiddleColumn');
-                        return middleColumn && middleColumn.scrollTop <= 10;
-                    }
-                ''')
-                
-                if at_top:
+                # Nothing left to scroll: we're at the top of the chat
+                if message_count and not scrolls:
                     logger.info("Reached the top of the chat history, no more messages")
                     break
-                    
-                # Scroll up to load older messages
-                scroll_changed = False
-                for _ in range(scroll_batch_size):
-                    scroll_result = await self.page.evaluate('''
-                        () => {
-                            const middleColumn = document.querySelector('#MiddleColumn');
-                            if (middleColumn) {
-                                // Check if we're already at the top
-                                if (middleColumn.scrollTop <= 10) {
-                                    return false;
-                                }
-                                
-                                // Store previous position
-                                const oldScrollTop = middleColumn.scrollTop;
-                                
-                                // Scroll up by 800px to load older messages
-                                middleColumn.scrollTop -= 800;
-                                
-                                // Return true if the scroll position changed
-                                return oldScrollTop !== middleColumn.scrollTop;
-                            }
-                            return false;
-                        }
-                    ''')
-                    
-                    if scroll_result:
-                        scroll_changed = True
-                        scroll_count += 1
-                        
-                    # Small pause between scrolls
-                    await asyncio.sleep(0.3)  
                 
-                # Log scroll status
-                scroll_status = await self.page.evaluate('''
-                    () => {
-                        const middleColumn = document.querySelector('#MiddleColumn');
-                        if (middleColumn) {
-                            return {
-                                scrollTop: middleColumn.scrollTop,
-                                scrollHeight: middleColumn.scrollHeight,
-                                clientHeight: middleColumn.clientHeight
-                            };
-                        }
-                        return null;
-                    }
-                ''')
+                # Wait until older messages are rendered after scrolling
+                await self._wait_for_new_messages(message_count)
                 
-                if scroll_status:
-                    logger.debug(f"Scroll position: {scroll_status['scrollTop']} / {scroll_status['scrollHeight']}")
-                
-                # Give time for content to load after scrolling
-                await asyncio.sleep(1.5)
+                now = time.monotonic()
                 
                 # Log batch performance
-                batch_end_time = time.time()
-                batch_duration = batch_end_time - batch_start_time
-                logger.info(f"Batch processed: {new_posts_in_batch} new posts in {batch_duration:.2f}s (total: {len(posts)}/{post_limit})")
-                batch_start_time = batch_end_time
+                if log_batches:
+                    logger.info(f"Batch processed: {new_posts_in_batch} new posts in {now - batch_start_time:.2f}s (total: {post_count}/{post_limit})")
+                    batch_start_time = now
                 
-                # Check if we found new posts or scrolling was effective
-                if new_posts_in_batch == 0 or not scroll_changed:
-                    consecutive_no_new_posts += 1
-                    logger.debug(f"No new content, attempt {consecutive_no_new_posts}/{max_no_new_attempts}")
-                else:
-                    consecutive_no_new_posts = 0
+                # Give up when neither new posts nor scrolling made progress for a while
+                if batch["posts"]:
+                    last_progress_time = now
+                elif now - last_progress_time > self._MAX_IDLE_SECONDS:
+                    logger.info(f"No new content for {self._MAX_IDLE_SECONDS:.0f}s, stopping scroll")
+                    break
+                elif debug:
+                    logger.debug(f"No new content for {now - last_progress_time:.1f}s")
             
-            logger.info(f"Extracted {len(posts)} posts with {scroll_count} scroll operations")
+            logger.info(f"Extracted {post_count} posts with {scroll_count} scroll operations")
             
             # No need to sort - posts are already in order from newest to oldest
             # because we started at the bottom and scrolled up
             
-            return posts
-            
         except Exception as e:
             logger.error(f"Error getting posts: {str(e)}")
-            return posts
     
-    async def _extract_post_data(self, message_element) -> Dict[str, Any]:
-        """Extract data from a post element with updated selectors."""
-        post_data = {}
+    async def _prepare_helpers(self) -> None:
+        """Reset the seen message ids, installing the page helpers if needed."""
+        if await self.page.evaluate(_RESET_SEEN_IDS_JS):
+            return
+            
+        # Registered for documents loaded later too, so the helper source is
+        # only sent once per page instead of once per channel
+        await self.page.evaluateOnNewDocument(_INSTALL_HELPERS_JS)
+        await self.page.evaluate(_INSTALL_HELPERS_JS)
+        
+    async def _scroll_up(self, steps: int) -> int:
+        """
+        Scroll the chat up step by step to load older messages.
+        
+        Args:
+            steps: Number of 800px scroll steps
+            
+        Returns:
+            Number of steps that changed the scroll position
+        """
+        # One call for the whole batch; each step returns once the chat changed
+        # after scrolling, at most after _SCROLL_STEP_WAIT_MS
+        result = await self._evaluate_value(_CALL_SCROLL_BATCH_JS, steps, self._SCROLL_STEP_WAIT_MS)
+        
+        if logger.isEnabledFor(logging.DEBUG) and result["scrollTop"] is not None:
+            logger.debug(f"Scroll position: {result['scrollTop']} / {result['scrollHeight']}")
+            
+        return result["scrolls"]
+    
+    async def _evaluate_value(self, function: str, *args) -> Any:
+        """
+        Call a page function and return its result by value.
+        
+        Page.evaluate() first creates a remote object for the result, then
+        fetches its JSON value and releases it: three round trips for an object
+        result. A single Runtime.evaluate with returnByValue does all of it.
+        
+        Args:
+            function: JavaScript function source
+            *args: JSON serializable arguments
+            
+        Returns:
+            The value returned (or resolved) by the function
+        """
+        expression = f"({function})({', '.join(json.dumps(arg) for arg in args)})"
+        response = await self.page._client.send('Runtime.evaluate', {
+            'expression': expression,
+            'returnByValue': True,
+            'awaitPromise': True,
+        })
+        if 'exceptionDetails' in response:
+            details = response['exceptionDetails']
+            raise Exception(f"Evaluation failed: {details.get('exception', {}).get('description') or details.get('text')}")
+        return response['result'].get('value')
+        
+    async def _wait_for_new_messages(self, prev_count: int, timeout_ms: int = 2000) -> bool:
+        """
+        Wait until more than prev_count message elements are in the DOM.
+        
+        Args:
+            prev_count: Number of message elements seen before scrolling
+            timeout_ms: Maximum wait in milliseconds
+            
+        Returns:
+            True if new messages appeared, False on timeout
+        """
+        try:
+            return await self._evaluate_value(_CALL_WAIT_FOR_MESSAGES_JS, _MESSAGE_SELECTOR, prev_count, timeout_ms)
+        except Exception as e:
+            logger.debug(f"Error waiting for new messages: {str(e)}")
+            return False
+    
+    def _intern(self, value: Any) -> Any:
+        """Return the shared copy of a string seen before in this channel."""
+        if isinstance(value, str):
+            return self._strings.setdefault(value, value)
+        return value
         
+    def _build_post_data(self, raw: Dict[str, Any]) -> Dict[str, Any]:
+        """Build post data from the fields collected by _EXTRACT_POST_JS."""
         try:
-            # Get post ID
-            post_id = await self.page.evaluate('''
-                (element) => {
-                    return element.getAttribute('data-mid') || 
-                           element.getAttribute('data-message-id') || 
-                           element.id || 
-                           null;
-                }
-            ''', message_element)
-            post_data["id"] = post_id
+            post_data = {"id": raw["id"]}
             
-            # Get post date
-            try:
-                # Try multiple date selectors
-                date_element = await message_element.querySelector('.time')
-                if not date_element:
-                    date_element = await message_element.querySelector('.date')
-                
-                if date_element:
-                    date_text = await self.page.evaluate('(element) => element.textContent', date_element)
-                    post_data["date"] = date_text
+            if raw["date"] is not None:
+                post_data["date"] = raw["date"]
+                timestamp = raw["timestamp"]
+                if timestamp:
+                    post_data["timestamp"] = timestamp
+                    post_data["datetime"] = None  # Filled in by _fill_datetimes() outside the scroll loop
                     
-                    # Try to get timestamp
-                    timestamp = await self.page.evaluate('''
-                        (element) => {
-                            if (element.hasAttribute('data-timestamp')) {
-                                return parseInt(element.getAttribute('data-timestamp'), 10);
-                            }
-                            return null;
-                        }
-                    ''', date_element)
-                    
-                    if timestamp:
-                        post_data["timestamp"] = timestamp
-                        post_data["datetime"] = datetime.fromtimestamp(timestamp / 1000).isoformat()  # Convert ms to seconds
-            except Exception as e:
-                logger.debug(f"Could not get post date: {str(e)}")
-                
-            # Get post content
-            try:
-                # Try multiple content selectors
-                content_element = await message_element.querySelector('.message-content')
-                if not content_element:
-                    content_element = await message_element.querySelector('.text-content')
-                if not content_element:
-                    content_element = await message_element.querySelector('.bubble-content')
-                
-                if content_element:
-                    content_text = await self.page.evaluate('''
-                        (element) => {
-                            const textElements = element.querySelectorAll('.text-content, .message-text');
-                            if (textElements.length > 0) {
-                                return Array.from(textElements).map(el => el.textContent).join('\\n');
-                            }
-                            return element.textContent;
-                        }
-                    ''', content_element)
-                    post_data["content"] = content_text
-            except Exception as e:
-                logger.debug(f"Could not get post content: {str(e)}")
-                
-            # Get post views
-            try:
-                views_element = await message_element.querySelector('.views, .message-views')
-                if views_element:
-                    views_text = await self.page.evaluate('(element) => element.textContent', views_element)
-                    views_match = re.search(r'(\d+(?:\.\d+)?[KMG]?)', views_text)
-                    if views_match:
-                        post_data["views"] = views_match.group(1)
-            except Exception as e:
-                logger.debug(f"Could not get post views: {str(e)}")
-                
-            # Get post reactions/likes
-            try:
-                reactions_count = await self.page.evaluate('''
-                    (element) => {
-                        // Try multiple selectors for reactions
-                        const reactionsElement = element.querySelector('.reactions, .reaction-counter, .like-button');
-                        if (!reactionsElement) return null;
-                        
-                        // For new Telegram Web interface
-                        const counters = reactionsElement.querySelectorAll('.counter, .reaction-count');
-                        if (counters.length > 0) {
-                            return Array.from(counters).reduce((sum, el) => {
-                                const count = parseInt(el.textContent, 10);
-                                return sum + (isNaN(count) ? 0 : count);
-                            }, 0);
-                        }
-                        
-                        // Fallback to using textContent
-                        const text = reactionsElement.textContent;
-                        const match = text.match(/\\d+/);
-                        return match ? parseInt(match[0], 10) : 0;
-                    }
-                ''', message_element)
-                
-                if reactions_count:
-                    post_data["reactions"] = reactions_count
-            except Exception as e:
-                logger.debug(f"Could not get post reactions: {str(e)}")
-                
-            # Get post comments
-            try:
-                comments_element = await message_element.querySelector('.replies, .comments-button, .comments-count')
-                if comments_element:
-                    comments_text = await self.page.evaluate('(element) => element.textContent', comments_element)
-                    comments_match = re.search(r'(\d+(?:\.\d+)?[KMG]?)', comments_text)
-                    if comments_match:
-                        post_data["comments"] = comments_match.group(1)
-            except Exception as e:
-                logger.debug(f"Could not get post comments: {str(e)}")
+            if raw["content"] is not None:
+                post_data["content"] = raw["content"]
                 
-            # Get media attachments
-            try:
-                # Updated selectors for media
-                media_data = await self.page.evaluate('''
-                    (element) => {
-                        const media = [];
-                        
-                        // Photos
-                        const photos = element.querySelectorAll('.media-photo, img.photo, .attachment-photo');
-                        photos.forEach(photo => {
-                            const src = photo.src || photo.dataset.src;
-                            if (src) media.push({type: 'photo', url: src});
-                        });
-                        
-                        // Videos
-                        const videos = element.querySelectorAll('.media-video, video, .attachment-video');
-                        videos.forEach(video => {
-                            const src = video.src || video.dataset.src;
-                            if (src) media.push({type: 'video', url: src});
-                        });
-                        
-                        // Documents
-                        const docs = element.querySelectorAll('.document, .attachment-document');
-                        docs.forEach(doc => {
-                            const nameElem = doc.querySelector('.document-name, .filename');
-                            const name = nameElem ? nameElem.textContent : 'Document';
-                            media.push({type: 'document', name: name});
-                        });
-                        
-                        return media;
-                    }
-                ''', message_element)
+            if raw["views"]:
+                post_data["views"] = raw["views"]
+                    
+            if raw["reactions"]:
+                post_data["reactions"] = raw["reactions"]
                 
-                if media_data and len(media_data) > 0:
-                    post_data["media"] = media_data
-            except Exception as e:
-                logger.debug(f"Could not get post media: {str(e)}")
+            if raw["comments"]:
+                post_data["comments"] = raw["comments"]
+                    
+            if raw["media"]:
+                post_data["media"] = tuple(
+                    {key: self._intern(value) for key, value in item.items()}
+                    for item in raw["media"]
+                )
                 
-            # Get forwarded info
-            try:
-                forwarded_element = await message_element.querySelector('.forwarded-from, .forward-name')
-                if forwarded_element:
-                    forwarded_text = await self.page.evaluate('(element) => element.textContent', forwarded_element)
-                    post_data["forwarded_from"] = forwarded_text
-            except Exception as e:
-                logger.debug(f"Could not get forwarded info: {str(e)}")
+            if raw["forwarded_from"] is not None:
+                post_data["forwarded_from"] = self._intern(raw["forwarded_from"])
                 
             return post_data
         except Exception as e:
-            logger.error(f"Error extracting post data: {str(e)}")
+            logger.error(f"Error building post data: {str(e)}")
             return {"id": "unknown", "error": str(e)}
@@ -7,15 +7,136 @@ import csv
 import json
 import logging
 import os
-import yaml
 from datetime import datetime, date
 from typing import Dict, List, Any, Optional
 
+try:
+    import orjson
+except ImportError:  # Optional, the standard json module is used without it
+    orjson = None
+
 logger = logging.getLogger("telegram_parser.config")
 
+# Default output directory, next to parser_modules/
+_DEFAULT_OUTPUT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "output")
+
+def _parse_date(text: str) -> date:
+    """Parse a YYYY-MM-DD date, raising ValueError if it is invalid."""
+    # Slicing is much faster than strptime for the usual exact shape
+    if len(text) == 10 and text[4] == '-' and text[7] == '-' and (text[:4] + text[5:7] + text[8:]).isdigit():
+        return date(int(text[:4]), int(text[5:7]), int(text[8:]))
+    return datetime.strptime(text, "%Y-%m-%d").date()
+
+def _to_date(value: Any) -> date:
+    """Convert a config file date, already a date when unquoted in YAML."""
+    if isinstance(value, date):
+        return value
+    return _parse_date(str(value))
+
+def _to_concurrency(value: Any) -> int:
+    """Convert a channel concurrency setting, at least 1."""
+    return max(1, int(value))
+
+def _to_list(value: Any) -> list:
+    """Check that a config file value is a list."""
+    if not isinstance(value, list):
+        raise ValueError("expected a list")
+    return value
+
+# Config file settings: (path of keys in the YAML document, attribute name, conversion or None).
+# Missing, null and empty values leave the attribute unchanged
+_CONFIG_SCHEMA = (
+    (('auth', 'phone'), 'phone', None),
+    (('auth', 'headless'), 'headless', None),
+    (('auth', 'proxy'), 'proxy', None),
+    (('parser', 'limit'), 'limit', None),
+    (('parser', 'date_range', 'start'), 'start_date', _to_date),
+    (('parser', 'date_range', 'end'), 'end_date', _to_date),
+    (('parser', 'performance', 'scroll_delay'), 'scroll_delay', None),
+    (('parser', 'performance', 'batch_size'), 'batch_size', None),
+    (('parser', 'performance', 'wait_time'), 'wait_time', None),
+    (('parser', 'performance', 'max_concurrency'), 'max_concurrency', _to_concurrency),
+    (('channels',), 'channels', _to_list),
+    (('output', 'directory'), 'output_dir', os.path.abspath),
+    (('output', 'format'), 'export_format', None),
+    (('output', 'xlsx_engine'), 'xlsx_engine', lambda value: str(value).lower()),
+)
+
+# Created on first use, PyYAML is only imported when there is a config file
+_YAML_LOADER = None
+
+def _get_yaml_loader():
+    """Return a safe YAML loader class that rejects duplicate mapping keys."""
+    global _YAML_LOADER
+    if _YAML_LOADER is None:
+        import yaml
+        
+        # libyaml's loader is much faster, when PyYAML was built with it
+        base_loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+        
+        class UniqueKeyLoader(base_loader):
+            """Safe loader raising on duplicate keys instead of keeping the last value."""
+            
+            def construct_mapping(self, node, deep=False):
+                seen = set()
+                for key_node, _ in node.value:
+                    # Merge keys ("<<") are flattened by the base loader, and keys given
+                    # explicitly may override merged ones
+                    if key_node.tag == 'tag:yaml.org,2002:merge':
+                        continue
+                    key = self.construct_object(key_node, deep=deep)
+                    if key in seen:
+                        raise yaml.constructor.ConstructorError(
+                            "while constructing a mapping", node.start_mark,
+                            f"found duplicate key {key!r}", key_node.start_mark)
+                    seen.add(key)
+                return super().construct_mapping(node, deep=deep)
+                
+        _YAML_LOADER = UniqueKeyLoader
+    return _YAML_LOADER
+
+# Keys identifying a channel in channel files, at least one is required
+_CHANNEL_ID_KEYS = ('name', 'username', 'id', 'url')
+
+# Directories already created in this process, so repeated checks skip the syscalls
+_ENSURED_DIRS = set()
+
 class Config:
     """Configuration manager for the Telegram parser."""
     
+    # Command line arguments that override the config file when given:
+    # (argument name, attribute name, conversion or None)
+    _ARG_MAP = (
+        ('phone', 'phone', None),
+        ('proxy', 'proxy', None),
+        ('stay_alive', 'stay_alive', bool),
+        ('limit', 'limit', None),
+        ('output', 'output_dir', os.path.abspath),
+        ('format', 'export_format', None),
+        ('max_concurrency', 'max_concurrency', _to_concurrency),
+        ('start_date', 'start_date', _parse_date),
+        ('end_date', 'end_date', _parse_date),
+    )
+    
+    # Rendered by __str__ with the instance attributes
+    _STR_TEMPLATE = (
+        "Configuration:\n"
+        "  Phone: {phone}\n"
+        "  Headless mode: {headless}\n"
+        "  Proxy: {proxy}\n"
+        "  Keep browser alive: {stay_alive}\n"
+        "  Channels: {channel_count} defined\n"
+        "  Message limit: {limit}\n"
+        "  Output directory: {output_dir}\n"
+        "  Export format: {export_format}\n"
+        "  Date range: {start_date} to {end_date}\n"
+        "  Performance settings:\n"
+        "    - Scroll delay: {scroll_delay}s\n"
+        "    - Batch size: {batch_size}\n"
+        "    - Wait time: {wait_time}s\n"
+        "    - Max concurrency: {max_concurrency}"
+    )
+    
     def __init__(self, config_path: Optional[str] = None):
         """
         Initialize configuration.
@@ -27,10 +148,12 @@ class Config:
         self.phone = None
         self.headless = False
         self.proxy = None
+        self.stay_alive = False  # Keep the browser running after exit
         self.channels = []
         self.limit = 100
-        self.output_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "output")
+        self.output_dir = _DEFAULT_OUTPUT_DIR
         self.export_format = "xlsx"
+        self.xlsx_engine = "auto"  # auto, xlsxwriter, openpyxl or pyexcelerate
         
         # Date range for filtering
         self.start_date = None  # datetime.date object
@@ -40,75 +163,39 @@ class Config:
         self.scroll_delay = 0.2  # Delay between scrolls in seconds
         self.batch_size = 10     # Number of scrolls per batch
         self.wait_time = 1.0     # Wait time after batch scrolling
+        self.max_concurrency = 1 # Number of channels parsed at the same time
         
         # Load configuration from file if provided
         if config_path and os.path.exists(config_path):
             self._load_config_file(config_path)
             
         # Create output directory
-        os.makedirs(self.output_dir, exist_ok=True)
+        self.ensure_output_dir()
         
     def _load_config_file(self, config_path: str) -> None:
         """Load configuration from YAML file."""
         try:
-            with open(config_path, 'r', encoding='utf-8') as f:
-                config_data = yaml.safe_load(f)
+            import yaml  # Only needed when there is a config file
+            
+            # Read as bytes, the loader detects and decodes UTF-8 itself
+            with open(config_path, 'rb') as f:
+                config_data = yaml.load(f, Loader=_get_yaml_loader())
                 
             if not config_data:
                 logger.warning(f"Config file {config_path} is empty or invalid")
                 return
                 
             # Load settings
-            if 'auth' in config_data:
-                auth_config = config_data['auth']
-                self.phone = auth_config.get('phone', self.phone)
-                self.headless = auth_config.get('headless', self.headless)
-                self.proxy = auth_config.get('proxy', self.proxy)
-                
-            if 'parser' in config_data:
-                parser_config = config_data['parser']
-                self.limit = parser_config.get('limit', self.limit)
-                
-                # Load date range if specified
-                if 'date_range' in parser_config:
-                    date_range = parser_config['date_range']
-                    start_date = date_range.get('start')
-                    end_date = date_range.get('end')
-                    
-                    if start_date:
-                        try:
-                            if isinstance(start_date, str):
-                                self.start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
-                            elif isinstance(start_date, date):
-                                self.start_date = start_date
-                        except ValueError:
-                            logger.error(f"Invalid start date format: {start_date}. Use YYYY-MM-DD")
-                            
-                    if end_date:
-                        try:
-                            if isinstance(end_date, str):
-                                self.end_date = datetime.strptime(end_date, "%Y-%m-%d").date()
-                            elif isinstance(end_date, date):
-                                self.end_date = end_date
-                        except ValueError:
-                            logger.error(f"Invalid end date format: {end_date}. Use YYYY-MM-DD")
-                
-                # Load performance settings
-                if 'performance' in parser_config:
-                    perf_config = parser_config['performance']
-                    self.scroll_delay = perf_config.get('scroll_delay', self.scroll_delay)
-                    self.batch_size = perf_config.get('batch_size', self.batch_size)
-                    self.wait_time = perf_config.get('wait_time', self.wait_time)
-                
-            if 'channels' in config_data and isinstance(config_data['channels'], list):
-                self.channels = config_data['channels']
-                
-            if 'output' in config_data:
-                output_config = config_data['output']
-                output_dir = output_config.get('directory')
-                if output_dir:
-                    self.output_dir = os.path.abspath(output_dir)
-                self.export_format = output_config.get('format', self.export_format)
+            for path, attr_name, convert in _CONFIG_SCHEMA:
+                value = config_data
+                for key in path:
+                    value = value.get(key) if isinstance(value, dict) else None
+                if value is None or value == '':
+                    continue
+                try:
+                    setattr(self, attr_name, convert(value) if convert else value)
+                except (TypeError, ValueError) as e:
+                    logger.error(f"Invalid {'.'.join(path)} in {config_path}: {value} ({e})")
                 
             logger.info(f"Loaded configuration from {config_path}")
         except Exception as e:
@@ -117,37 +204,29 @@ class Config:
     def update_from_args(self, args) -> None:
         """Update configuration from command line arguments."""
         # Update settings from args, overriding config file
-        if hasattr(args, 'phone') and args.phone:
-            self.phone = args.phone
-            
-        if hasattr(args, 'headless'):
-            self.headless = args.headless
-            
-        if hasattr(args, 'proxy') and args.proxy:
-            self.proxy = args.proxy
-            
-        if hasattr(args, 'limit') and args.limit:
-            self.limit = args.limit
-            
-        if hasattr(args, 'output') and args.output:
-            self.output_dir = os.path.abspath(args.output)
-            os.makedirs(self.output_dir, exist_ok=True)
-            
-        if hasattr(args, 'format') and args.format:
-            self.export_format = args.format
-            
-        # Parse date range arguments
-        if hasattr(args, 'start_date') and args.start_date:
+        for arg_name, attr_name, convert in self._ARG_MAP:
+            value = getattr(args, arg_name, None)
+            if value is None or value == '':
+                continue
             try:
-                self.start_date = datetime.strptime(args.start_date, "%Y-%m-%d").date()
+                setattr(self, attr_name, convert(value) if convert else value)
             except ValueError:
-                logger.error(f"Invalid start date format: {args.start_date}. Use YYYY-MM-DD")
+                logger.error(f"Invalid {arg_name.replace('_', ' ')} format: {value}. Use YYYY-MM-DD")
                 
-        if hasattr(args, 'end_date') and args.end_date:
-            try:
-                self.end_date = datetime.strptime(args.end_date, "%Y-%m-%d").date()
-            except ValueError:
-                logger.error(f"Invalid end date format: {args.end_date}. Use YYYY-MM-DD")
+        # A flag, so False is a value too
+        headless = getattr(args, 'headless', None)
+        if headless is not None:
+            self.headless = headless
+            
+        if getattr(args, 'output', None):
+            self.ensure_output_dir()
+            
+    def ensure_output_dir(self) -> None:
+        """Create the output directory, once per process for each path."""
+        output_dir = os.path.abspath(self.output_dir)
+        if output_dir not in _ENSURED_DIRS:
+            os.makedirs(output_dir, exist_ok=True)
+            _ENSURED_DIRS.add(output_dir)
             
     def load_channels_from_file(self, file_path: str) -> List[Dict[str, Any]]:
         """
@@ -180,8 +259,9 @@ class Config:
             
     def _load_channels_from_json(self, file_path: str) -> List[Dict[str, Any]]:
         """Load channels from JSON file."""
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        with open(file_path, 'rb') as f:
+            raw = f.read()
+        data = orjson.loads(raw) if orjson is not None else json.loads(raw)
             
         if isinstance(data, list):
             channels = data
@@ -199,7 +279,7 @@ class Config:
                 continue
                 
             # Check if at least one identifier is present
-            if not any(key in channel for key in ['name', 'username', 'id', 'url']):
+            if not any(key in channel for key in _CHANNEL_ID_KEYS):
                 logger.warning(f"Channel missing identifier (name/username/id/url): {channel}")
                 continue
                 
@@ -212,17 +292,26 @@ class Config:
         """Load channels from CSV file."""
         channels = []
         
-        with open(file_path, 'r', encoding='utf-8', newline='') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                # Clean up empty values
-                channel = {k: v for k, v in row.items() if v.strip()}
+        with open(file_path, 'r', encoding='utf-8', newline='', buffering=1 << 20) as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is None:
+                logger.warning(f"Channel file {file_path} is empty")
+                return channels
                 
-                # Check if at least one identifier is present
-                if not any(key in channel for key in ['name', 'username', 'id', 'url']):
-                    logger.warning(f"Channel missing identifier (name/username/id/url): {channel}")
+            # Positions of the identifier columns, checked before building each channel
+            id_columns = [i for i, name in enumerate(header) if name in _CHANNEL_ID_KEYS]
+            
+            for row in reader:
+                if not row:  # Blank line
+                    continue
+                # Check if at least one identifier is present; short rows have no value for missing columns
+                if not any(i < len(row) and row[i].strip() for i in id_columns):
+                    logger.warning(f"Channel missing identifier (name/username/id/url): {row}")
                     continue
                     
+                # Clean up empty values; values beyond the header are dropped
+                channel = {name: value for name, value in zip(header, row) if value.strip()}
                 channels.append(channel)
                 
         logger.info(f"Loaded {len(channels)} channels from {file_path}")
@@ -230,19 +319,4 @@ class Config:
         
     def __str__(self) -> str:
         """Return string representation of the config."""
-        config_info = [
-            f"Configuration:",
-            f"  Phone: {self.phone}",
-            f"  Headless mode: {self.headless}",
-            f"  Proxy: {self.proxy}",
-            f"  Channels: {len(self.channels)} defined",
-            f"  Message limit: {self.limit}",
-            f"  Output directory: {self.output_dir}",
-            f"  Export format: {self.export_format}",
-            f"  Date range: {self.start_date or 'None'} to {self.end_date or 'None'}",
-            f"  Performance settings:",
-            f"    - Scroll delay: {self.scroll_delay}s",
-            f"    - Batch size: {self.batch_size}",
-            f"    - Wait time: {self.wait_time}s"
-        ]
-        return "\n".join(config_info)
+        return self._STR_TEMPLATE.format(channel_count=len(self.channels), **vars(self))
@@ -8,33 +8,220 @@ import json
 import logging
 import os
 import re
+import tempfile
+from contextlib import contextmanager, suppress
 from datetime import datetime
+from itertools import repeat
 from typing import Dict, Any, List, Optional, Tuple, Union
 
-import pandas as pd
+try:
+    import orjson
+except ImportError:  # Optional, the standard json module is used without it
+    orjson = None
+
+try:
+    import xlsxwriter
+except ImportError:  # Optional, openpyxl is used without it
+    xlsxwriter = None
+
+try:
+    import pyexcelerate
+except ImportError:  # Optional, only used when selected with output.xlsx_engine
+    pyexcelerate = None
 
 logger = logging.getLogger("telegram_parser.data_exporter")
 
+# Buffer size for export files, fewer write calls for large exports
+_WRITE_BUFFER_SIZE = 1 << 20
+
+def _dump_json(data: Any) -> bytes:
+    """Serialize data as indented UTF-8 JSON, with orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+
+def _dump_json_line(data: Any) -> bytes:
+    """Serialize data as one compact line of UTF-8 JSON, ending with a newline."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE)
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+
+def _make_temp_file(path: str) -> Tuple[int, str]:
+    """
+    Create a uniquely named temporary file next to path, on the same file system.
+    
+    Concurrent writers of the same path each get their own temporary file.
+    
+    Returns:
+        Tuple of (open file descriptor, temporary file path)
+    """
+    directory, name = os.path.split(path)
+    return tempfile.mkstemp(dir=directory or '.', prefix=f"{name}.", suffix='.tmp')
+
+@contextmanager
+def _atomic_open(path: str, mode: str = 'wb', **kwargs):
+    """
+    Open a temporary file that replaces path only once it is completely written.
+    
+    A failed or interrupted export never leaves a truncated file at path.
+    
+    Args:
+        path: Final path of the file
+        mode: File mode, a write mode
+        **kwargs: Other arguments for open()
+    """
+    fd, temp_path = _make_temp_file(path)
+    try:
+        with open(fd, mode, **kwargs) as f:
+            yield f
+        os.replace(temp_path, path)
+    except BaseException:
+        with suppress(OSError):
+            os.remove(temp_path)
+        raise
+
+# Characters not allowed in file names, including the Windows path separator
+_UNSAFE_FILENAME_RE = re.compile(r'[\\/:*?"<>|]')
+
+# Value types written to tabular exports as they are
+_SCALAR_TYPES = frozenset((str, int, float, bool, type(None)))
+
+class _XlsxWriter:
+    """
+    Streams sheets to an XLSX file, row by row.
+    
+    Uses xlsxwriter in constant memory mode when it is installed,
+    otherwise an openpyxl write-only workbook. PyExcelerate, faster for
+    plain values but holding every sheet in memory until save(), is
+    used only when asked for.
+    """
+    
+    def __init__(self, path: str, engine: str = "auto"):
+        """
+        Create the workbook.
+        
+        Args:
+            path: Path of the XLSX file to write
+            engine: "pyexcelerate", "xlsxwriter" or "openpyxl"; "auto" or an engine
+                that is not installed picks xlsxwriter when available, else openpyxl
+        """
+        self.path = path
+        self._titles = set()
+        
+        if engine == "pyexcelerate" and pyexcelerate is not None:
+            self._engine = "pyexcelerate"
+        elif engine != "openpyxl" and xlsxwriter is not None:
+            self._engine = "xlsxwriter"
+        else:
+            self._engine = "openpyxl"
+            
+        if self._engine == "pyexcelerate":
+            self._workbook = pyexcelerate.Workbook()
+            self._text_style = pyexcelerate.Style(data_type=pyexcelerate.DataTypes.DataTypes.INLINE_STRING)
+        elif self._engine == "xlsxwriter":
+            # Cell text is written as is, never turned into formulas or links.
+            # The file name is set by save(), xlsxwriter only writes the file on close()
+            self._workbook = xlsxwriter.Workbook(None, {
+                'constant_memory': True,
+                'strings_to_formulas': False,
+                'strings_to_urls': False
+            })
+        else:
+            from openpyxl import Workbook
+            from openpyxl.cell import WriteOnlyCell
+            self._workbook = Workbook(write_only=True)
+            self._text_cell = WriteOnlyCell
+            
+    def add_sheet(self, title: str, header, rows) -> None:
+        """
+        Add a sheet with a header row and data rows.
+        
+        Args:
+            title: Sheet name, made unique within the workbook
+            header: Column names
+            rows: Iterable of rows, each a tuple of cell values
+        """
+        title = self._unique_title(title)
+        
+        # Cell text starting with "=" is kept as text by every engine, like xlsxwriter
+        # with strings_to_formulas off, instead of being written as a formula
+        if self._engine == "pyexcelerate":
+            data = [tuple(header), *rows]
+            sheet = self._workbook.new_sheet(title, data=data)
+            for row_number, row in enumerate(data, 1):
+                for column_number, value in enumerate(row, 1):
+                    if isinstance(value, str) and value.startswith('='):
+                        sheet.set_cell_style(row_number, column_number, self._text_style)
+        elif self._engine == "xlsxwriter":
+            sheet = self._workbook.add_worksheet(title)
+            sheet.write_row(0, 0, tuple(header))
+            write_row = sheet.write_row
+            for row_index, row in enumerate(rows, 1):
+                write_row(row_index, 0, row)
+        else:
+            sheet = self._workbook.create_sheet(title)
+            sheet.append(tuple(header))
+            for row in rows:
+                sheet.append([
+                    self._as_text(sheet, value) if isinstance(value, str) and value.startswith('=') else value
+                    for value in row
+                ])
+                
+    def save(self) -> None:
+        """Finish writing the file, through a temporary file next to it like _atomic_open."""
+        fd, temp_path = _make_temp_file(self.path)
+        os.close(fd)
+        try:
+            if self._engine == "xlsxwriter":
+                self._workbook.filename = temp_path
+                self._workbook.close()
+            else:
+                self._workbook.save(temp_path)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            with suppress(OSError):
+                os.remove(temp_path)
+            raise
+            
+    def _as_text(self, sheet, value: str):
+        """Wrap a value for an openpyxl write-only sheet so it is stored as text."""
+        cell = self._text_cell(sheet, value)
+        cell.data_type = 's'
+        return cell
+        
+    def _unique_title(self, title: str) -> str:
+        """Add a number to a sheet name already in use; Excel compares them case-insensitively."""
+        unique_title = title
+        number = 1
+        while unique_title.lower() in self._titles:
+            suffix = str(number)
+            unique_title = f"{title[:31 - len(suffix)]}{suffix}"
+            number += 1
+        self._titles.add(unique_title.lower())
+        return unique_title
+
 class DataExporter:
     """Exports parsed data to various formats."""
 
     def _sanitize_filename(self, filename: str) -> str:
         """Удаляет недопустимые символы из имени файла."""
-        return re.sub(r'[\/:*?"<>|]', '_', filename)
+        return _UNSAFE_FILENAME_RE.sub('_', filename)
     
     def __init__(self, config):
         """Initialize with config."""
         self.config = config
         self.output_dir = config.output_dir
-        os.makedirs(self.output_dir, exist_ok=True)
+        config.ensure_output_dir()
         
-    def export_data(self, data: Dict[str, Any], channel_name: str) -> str:
+    def export_data(self, data: Dict[str, Any], channel_name: str,
+                    columns: Optional[Dict[str, List[Any]]] = None) -> str:
         """
         Export data to the specified format.
         
         Args:
             data: The data to export
             channel_name: Name of the channel
+            columns: Posts already flattened by _flatten_posts_columnar, if available
             
         Returns:
             Path to the exported file
@@ -48,12 +235,31 @@ class DataExporter:
         # Determine export format
         export_format = self.config.export_format.lower()
         
+        return self._export_data(data, safe_channel_name, timestamp, export_format, columns)
+        
+    def _export_data(self, data: Dict[str, Any], safe_channel_name: str, timestamp: str,
+                     export_format: str, columns: Optional[Dict[str, List[Any]]] = None) -> str:
+        """
+        Export data to the given format, with the filename parts already prepared.
+        
+        Args:
+            data: The data to export
+            safe_channel_name: Channel name already passed through _sanitize_filename
+            timestamp: Export timestamp used in the filename
+            export_format: Lowercase export format
+            columns: Posts already flattened by _flatten_posts_columnar, if available
+            
+        Returns:
+            Path to the exported file
+        """
         if export_format == "json":
             return self._export_json(data, safe_channel_name, timestamp)
+        elif export_format == "jsonl":
+            return self._export_jsonl(data, safe_channel_name, timestamp)
         elif export_format == "csv":
-            return self._export_csv(data, safe_channel_name, timestamp)
+            return self._export_csv(data, safe_channel_name, timestamp, columns)
         elif export_format == "xlsx":
-            return self._export_xlsx(data, safe_channel_name, timestamp)
+            return self._export_xlsx(data, safe_channel_name, timestamp, columns)
         else:
             logger.warning(f"Unknown export format: {export_format}, defaulting to JSON")
             return self._export_json(data, safe_channel_name, timestamp)
@@ -72,67 +278,77 @@ class DataExporter:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         export_format = self.config.export_format.lower()
         
-        # Export individual channels
-        file_paths = []
-        for data in data_list:
-            channel_name = data.get("channel", {}).get("name", "unknown")
-            channel_name = self._sanitize_filename(channel_name)
-            file_path = self.export_data(data, channel_name)
-            file_paths.append(file_path)
-            
-        # Export combined data if possible
-        combined_file = ""
+        # Flatten posts once, for both the channel files and the combined workbook
+        if export_format in ("csv", "xlsx"):
+            columns_list = [self._flatten_posts_columnar(data.get("posts", [])) for data in data_list]
+        else:
+            columns_list = [None] * len(data_list)
         
-        # For XLSX, we can create a workbook with multiple sheets
-        if export_format == "xlsx":
-            combined_file = os.path.join(self.output_dir, f"{output_prefix}_{timestamp}.xlsx")
-            try:
-                with pd.ExcelWriter(combined_file, engine='openpyxl') as writer:
-                    # Add each channel to its own sheet
-                    for data in data_list:
-                        channel_info = data.get("channel", {})
-                        channel_name = channel_info.get("name", "unknown")
-                        safe_channel_name = self._sanitize_filename(channel_name)
-                        
-                        # Limit sheet name to 31 characters (Excel limitation)
-                        sheet_name = safe_channel_name[:31]
-                        
-                        # Export posts
-                        posts = data.get("posts", [])
-                        if posts:
-                            flat_posts = [self._flatten_post(post) for post in posts]
-                            df = pd.DataFrame(flat_posts)
-                            df.to_excel(writer, sheet_name=sheet_name, index=False)
-                            
-                    # Create a summary sheet
-                    summary_data = []
-                    for data in data_list:
-                        channel_info = data.get("channel", {})
-                        summary_data.append({
-                            "Channel Name": channel_info.get("name", "unknown"),
-                            "Username": channel_info.get("username", ""),
-                            "Posts Count": len(data.get("posts", [])),
-                            "Parsed At": data.get("parsed_at", "")
-                        })
+        channel_names = [self._sanitize_filename(data.get("channel", {}).get("name", "unknown")) for data in data_list]
+        
+        # The whole batch shares one timestamp and format
+        timestamps = repeat(timestamp, len(data_list))
+        export_formats = repeat(export_format, len(data_list))
+        
+        file_paths = list(map(self._export_data, data_list, channel_names, timestamps, export_formats, columns_list))
+        combined_file = self._export_combined_xlsx(data_list, columns_list, channel_names, output_prefix, timestamp) if export_format == "xlsx" else ""
+        return combined_file, file_paths
+    
+    def _export_combined_xlsx(self, data_list: List[Dict[str, Any]], columns_list: List[Dict[str, List[Any]]],
+                              channel_names: List[str], output_prefix: str, timestamp: str) -> str:
+        """
+        Export all channels to one workbook, a sheet per channel and a summary sheet.
+        
+        Args:
+            data_list: List of channel data dictionaries
+            columns_list: Flattened posts of each channel
+            channel_names: Sanitized name of each channel
+            output_prefix: Prefix for the output filename
+            timestamp: Export timestamp used in the filename
+            
+        Returns:
+            Path to the workbook, or an empty string if it could not be written
+        """
+        combined_file = os.path.join(self.output_dir, f"{output_prefix}_{timestamp}.xlsx")
+        try:
+            workbook = _XlsxWriter(combined_file, self.config.xlsx_engine)
+            
+            # Add each channel to its own sheet, collecting the summary rows on the way
+            summary_rows = []
+            for data, columns, safe_channel_name in zip(data_list, columns_list, channel_names):
+                channel_info = data.get("channel", {})
+                posts = data.get("posts", [])
+                
+                # Export posts, the sheet name limited to 31 characters (Excel limitation)
+                if posts:
+                    workbook.add_sheet(safe_channel_name[:31], columns.keys(), zip(*columns.values()))
                     
-                    if summary_data:
-                        summary_df = pd.DataFrame(summary_data)
-                        summary_df.to_excel(writer, sheet_name="Summary", index=False)
+                summary_rows.append((
+                    channel_info.get("name", "unknown"),
+                    channel_info.get("username", ""),
+                    len(posts),
+                    data.get("parsed_at", "")
+                ))
                 
-                logger.info(f"Combined data exported to Excel: {combined_file}")
-            except Exception as e:
-                logger.error(f"Error exporting combined data to Excel: {str(e)}")
-                combined_file = ""
+            # Create a summary sheet
+            if summary_rows:
+                workbook.add_sheet("Summary", ("Channel Name", "Username", "Posts Count", "Parsed At"), summary_rows)
                 
-        return combined_file, file_paths
+            workbook.save()
+            
+            logger.info(f"Combined data exported to Excel: {combined_file}")
+            return combined_file
+        except Exception as e:
+            logger.error(f"Error exporting combined data to Excel: {str(e)}")
+            return ""
     
     def _export_json(self, data: Dict[str, Any], channel_name: str, timestamp: str) -> str:
         """Export data to JSON format."""
         output_file = os.path.join(self.output_dir, f"{channel_name}_{timestamp}.json")
         
         try:
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            with _atomic_open(output_file) as f:
+                f.write(_dump_json(data))
             logger.info(f"Data exported to JSON: {output_file}")
             return output_file
         except Exception as e:
@@ -140,15 +356,33 @@ class DataExporter:
             # Try to save with a simple filename as fallback
             fallback_file = os.path.join(self.output_dir, f"export_{timestamp}.json")
             try:
-                with open(fallback_file, 'w', encoding='utf-8') as f:
-                    json.dump(data, f, ensure_ascii=False, indent=2)
+                with _atomic_open(fallback_file) as f:
+                    f.write(_dump_json(data))
                 logger.warning(f"Used fallback filename for JSON export: {fallback_file}")
                 return fallback_file
             except Exception as fallback_error:
                 logger.error(f"Critical export error: {str(fallback_error)}")
                 raise RuntimeError(f"Failed to export data: {str(e)}, fallback also failed: {str(fallback_error)}")
     
-    def _export_csv(self, data: Dict[str, Any], channel_name: str, timestamp: str) -> str:
+    def _export_jsonl(self, data: Dict[str, Any], channel_name: str, timestamp: str) -> str:
+        """Export data to JSON Lines: a first line with everything but the posts, then one line per post."""
+        output_file = os.path.join(self.output_dir, f"{channel_name}_{timestamp}.jsonl")
+        
+        try:
+            header = {key: value for key, value in data.items() if key != "posts"}
+            with _atomic_open(output_file, buffering=_WRITE_BUFFER_SIZE) as f:
+                f.write(_dump_json_line(header))
+                f.writelines(map(_dump_json_line, data.get("posts", [])))
+            logger.info(f"Data exported to JSON Lines: {output_file}")
+            return output_file
+        except Exception as e:
+            logger.error(f"Error exporting to JSON Lines: {str(e)}")
+            logger.warning("Falling back to JSON export")
+            # Fallback to JSON
+            return self._export_json(data, channel_name, timestamp)
+    
+    def _export_csv(self, data: Dict[str, Any], channel_name: str, timestamp: str,
+                    columns: Optional[Dict[str, List[Any]]] = None) -> str:
         """Export data to CSV format."""
         output_file = os.path.join(self.output_dir, f"{channel_name}_{timestamp}.csv")
         
@@ -161,18 +395,14 @@ class DataExporter:
                 return self._export_json(data, channel_name, timestamp)  # Fallback to JSON
                 
             # Normalize data for CSV
-            flat_posts = []
-            for post in posts:
-                flat_post = self._flatten_post(post)
-                flat_posts.append(flat_post)
+            if columns is None:
+                columns = self._flatten_posts_columnar(posts)
                 
-            # Write to CSV
-            with open(output_file, 'w', encoding='utf-8', newline='') as f:
-                if flat_posts:
-                    fieldnames = flat_posts[0].keys()
-                    writer = csv.DictWriter(f, fieldnames=fieldnames)
-                    writer.writeheader()
-                    writer.writerows(flat_posts)
+            # Write to CSV, row by row from the columns (None is written as empty)
+            with _atomic_open(output_file, 'w', encoding='utf-8', newline='', buffering=_WRITE_BUFFER_SIZE) as f:
+                writer = csv.writer(f)
+                writer.writerow(columns.keys())
+                writer.writerows(zip(*columns.values()))
                     
             logger.info(f"Data exported to CSV: {output_file}")
             
@@ -180,8 +410,8 @@ class DataExporter:
             channel_info = data.get("channel", {})
             if channel_info:
                 channel_info_file = os.path.join(self.output_dir, f"{channel_name}_info_{timestamp}.json")
-                with open(channel_info_file, 'w', encoding='utf-8') as f:
-                    json.dump(channel_info, f, ensure_ascii=False, indent=2)
+                with _atomic_open(channel_info_file) as f:
+                    f.write(_dump_json(channel_info))
                 logger.info(f"Channel info exported to: {channel_info_file}")
                 
             return output_file
@@ -191,7 +421,8 @@ class DataExporter:
             # Fallback to JSON
             return self._export_json(data, channel_name, timestamp)
     
-    def _export_xlsx(self, data: Dict[str, Any], channel_name: str, timestamp: str) -> str:
+    def _export_xlsx(self, data: Dict[str, Any], channel_name: str, timestamp: str,
+                     columns: Optional[Dict[str, List[Any]]] = None) -> str:
         """Export data to XLSX format."""
         output_file = os.path.join(self.output_dir, f"{channel_name}_{timestamp}.xlsx")
         
@@ -204,34 +435,29 @@ class DataExporter:
                 return self._export_json(data, channel_name, timestamp)  # Fallback to JSON
                 
             # Normalize data for Excel
-            flat_posts = []
-            for post in posts:
-                flat_post = self._flatten_post(post)
-                flat_posts.append(flat_post)
-                
-            # Create DataFrame
-            df = pd.DataFrame(flat_posts)
+            if columns is None:
+                columns = self._flatten_posts_columnar(posts)
+            
+            # Rows are streamed straight to the file, without pandas
+            workbook = _XlsxWriter(output_file, self.config.xlsx_engine)
+            
+            # Write posts to sheet
+            workbook.add_sheet('Posts', columns.keys(), zip(*columns.values()))
             
-            # Create Excel writer
-            with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-                # Write posts to sheet
-                df.to_excel(writer, sheet_name='Posts', index=False)
+            # Write channel info to separate sheet
+            channel_info = data.get("channel", {})
+            if channel_info:
+                workbook.add_sheet('Channel Info', channel_info.keys(), [tuple(channel_info.values())])
                 
-                # Write channel info to separate sheet
-                channel_info = data.get("channel", {})
-                if channel_info:
-                    # Convert to DataFrame
-                    channel_df = pd.DataFrame([channel_info])
-                    channel_df.to_excel(writer, sheet_name='Channel Info', index=False)
-                    
-                # Write metadata
-                metadata = {
-                    "Parsed at": data.get("parsed_at", datetime.now().isoformat()),
-                    "Total posts": len(posts),
-                    "Export timestamp": timestamp
-                }
-                metadata_df = pd.DataFrame([metadata])
-                metadata_df.to_excel(writer, sheet_name='Metadata', index=False)
+            # Write metadata
+            metadata = {
+                "Parsed at": data.get("parsed_at", datetime.now().isoformat()),
+                "Total posts": len(posts),
+                "Export timestamp": timestamp
+            }
+            workbook.add_sheet('Metadata', metadata.keys(), [tuple(metadata.values())])
+            
+            workbook.save()
                 
             logger.info(f"Data exported to Excel: {output_file}")
             return output_file
@@ -241,9 +467,35 @@ class DataExporter:
             # Fallback to JSON
             return self._export_json(data, channel_name, timestamp)
     
+    def _flatten_posts_columnar(self, posts: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+        """
+        Flatten posts into columns for tabular export formats.
+        
+        Args:
+            posts: The posts to flatten
+            
+        Returns:
+            Dictionary of column name to values, one per post (None where a post
+            has no such field), with columns in order of first appearance
+        """
+        columns = {}
+        post_count = len(posts)
+        
+        for i, post in enumerate(posts):
+            for key, value in self._flatten_post(post).items():
+                column = columns.get(key)
+                if column is None:
+                    column = columns[key] = [None] * post_count
+                column[i] = value
+                
+        return columns
+        
     def _flatten_post(self, post: Dict[str, Any], prefix: str = "") -> Dict[str, Any]:
         """
-        Flatten post data recursively for tabular export formats.
+        Flatten post data for tabular export formats.
+        
+        Nested dictionaries are walked with an explicit stack of the item
+        iterators of their parents instead of recursion, keeping keys in order.
         
         Args:
             post: The post data to flatten
@@ -253,34 +505,49 @@ class DataExporter:
             Flattened dictionary
         """
         flat_post = {}
+        parent_key = prefix
+        items = iter(post.items())
+        stack = []
         
-        for key, value in post.items():
-            # Create the full key with prefix
-            full_key = f"{prefix}.{key}" if prefix else key
-            
-            # Handle special cases
-            if key == "media" and isinstance(value, list):
-                # Join media URLs with semicolons
-                flat_post[full_key] = "; ".join(str(url) for url in value if url)
-            # Handle different data types
-            elif isinstance(value, (str, int, float, bool, type(None))):
-                flat_post[full_key] = value
-            elif isinstance(value, dict):
-                # Recursively flatten nested dictionaries
-                nested_flat = self._flatten_post(value, full_key)
-                flat_post.update(nested_flat)
-            elif isinstance(value, list):
-                # Handle lists - try to convert to string
-                try:
-                    items = [str(item) for item in value if item is not None]
-                    flat_post[full_key] = "; ".join(items)
-                except Exception:
-                    flat_post[full_key] = f"[List with {len(value)} items]"
+        while True:
+            for key, value in items:
+                # Create the full key with prefix
+                full_key = f"{parent_key}.{key}" if parent_key else key
+                
+                # Exact type lookups first, isinstance only for subclasses
+                value_type = type(value)
+                
+                # Handle special cases
+                if key == "media" and isinstance(value, (list, tuple)):
+                    # Join media URLs with semicolons
+                    # A list comprehension, join() would build a list from a generator anyway
+                    flat_post[full_key] = "; ".join([str(url) for url in value if url])
+                # Handle different data types
+                elif value_type in _SCALAR_TYPES or isinstance(value, (str, int, float, bool)):
+                    flat_post[full_key] = value
+                elif value_type is dict or isinstance(value, dict):
+                    # Flatten the nested dictionary next, then carry on with this one
+                    stack.append((parent_key, items))
+                    parent_key = full_key
+                    items = iter(value.items())
+                    break
+                elif isinstance(value, (list, tuple)):
+                    # Handle lists - try to convert to string
+                    try:
+                        items_text = [str(item) for item in value if item is not None]
+                        flat_post[full_key] = "; ".join(items_text)
+                    except Exception:
+                        flat_post[full_key] = f"[List with {len(value)} items]"
+                else:
+                    # Handle other types by converting to string
+                    try:
+                        flat_post[full_key] = str(value)
+                    except Exception:
+                        flat_post[full_key] = f"[Unsupported type: {type(value).__name__}]"
             else:
-                # Handle other types by converting to string
-                try:
-                    flat_post[full_key] = str(value)
-                except Exception:
-                    flat_post[full_key] = f"[Unsupported type: {type(value).__name__}]"
+                # All items of this dictionary are done, go back to its parent
+                if not stack:
+                    break
+                parent_key, items = stack.pop()
         
         return flat_post